@@ -2,8 +2,11 @@ from app.db import async_session, Customer, CustomerOrder
 from app.models import CustomerCreate, CustomerOrderCreate
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
+from sqlalchemy import func, or_, case, literal_column
+from typing import Optional
 import uuid
 import datetime
+import re
 
 async def create_customer(customer: CustomerCreate):
     async with async_session() as session:
@@ -66,4 +69,68 @@ async def get_all_customers_with_orders():
                 ]
             }
             for customer in customers
-        ]
\ No newline at end of file
+        ]
+
+def normalize_phone(phone: str) -> str:
+    # Gleiche Normalisierung wie im Index ix_customers_phone_normalized: nur Ziffern
+    return re.sub(r"[^0-9]", "", phone)
+
+async def search_customers(email: Optional[str] = None, phone: Optional[str] = None,
+                           q: Optional[str] = None, limit: int = 20):
+    """
+    Sucht Kunden über exakte E-Mail, normalisierte Telefonnummer und unscharfen
+    Namen/Adresse (pg_trgm). Alle Kriterien laufen in einer einzigen Abfrage über
+    die Indizes; Treffer werden nach Score absteigend sortiert.
+    """
+    conditions = []
+    scores = []
+
+    if email:
+        email_match = Customer.email == email.strip()
+        conditions.append(email_match)
+        scores.append(case((email_match, 1.0), else_=0.0))
+
+    if phone:
+        normalized = normalize_phone(phone)
+        if normalized:
+            # Muster als Literale, damit der Ausdruck exakt dem Funktionsindex entspricht
+            normalized_column = func.regexp_replace(
+                Customer.phone, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'")
+            )
+            phone_match = normalized_column == normalized
+            conditions.append(phone_match)
+            scores.append(case((phone_match, 1.0), else_=0.0))
+
+    if q:
+        # Der %-Operator nutzt die GIN-Trigram-Indizes, similarity() liefert den Rang
+        conditions.append(or_(Customer.name.op("%")(q), Customer.address.op("%")(q)))
+        scores.append(func.greatest(func.similarity(Customer.name, q),
+                                    func.similarity(Customer.address, q)))
+
+    if not conditions:
+        return []
+
+    score = scores[0]
+    for extra in scores[1:]:
+        score = score + extra
+    score = score.label("score")
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(Customer, score)
+            .where(or_(*conditions))
+            .order_by(score.desc(), Customer.name)
+            .limit(limit)
+        )
+        return [
+            {
+                "customer_id": customer.customer_id,
+                "name": customer.name,
+                "email": customer.email,
+                "phone": customer.phone,
+                "address": customer.address,
+                "preferred_contact_method": customer.preferred_contact_method.value if customer.preferred_contact_method else None,
+                "score": round(float(rank), 4)
+            }
+            for customer, rank in result.all()
+        ]
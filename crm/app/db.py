@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import Column, String, Date, ForeignKey, text, Integer, Enum
+from sqlalchemy import Column, String, Date, ForeignKey, text, Integer, Enum, Index, func
 import os
 import enum
 
@@ -26,6 +26,16 @@ class Customer(Base):
     preferred_contact_method = Column(Enum(PreferredContactMethod), nullable=True)  #
     customer_orders = relationship("CustomerOrder", backref="customer")
 
+    __table_args__ = (
+        # Trigram-Indizes für die unscharfe Suche nach Name und Adresse (pg_trgm)
+        Index("ix_customers_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_customers_address_trgm", "address", postgresql_using="gin",
+              postgresql_ops={"address": "gin_trgm_ops"}),
+        # Telefonnummer nur aus Ziffern, damit "+49 123-456" und "49123456" gleich gefunden werden
+        Index("ix_customers_phone_normalized", func.regexp_replace(phone, "[^0-9]", "", "g")),
+    )
+
 class CustomerOrder(Base):
     __tablename__ = 'customer_orders'
     order_id = Column(String, primary_key=True, index=True)
@@ -36,6 +46,8 @@ class CustomerOrder(Base):
 
 async def init_db():
     async with engine.begin() as conn:
+        # Extension für die Trigram-Indizes der Kundensuche
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
         # Tabellen neu erstellen
         await conn.run_sync(Base.metadata.drop_all)
@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query
 from app.models import CustomerCreate, CustomerOrderCreate
 from app import crud, db
 import asyncio
 from app.crud import get_all_customers_with_orders
+from typing import Optional
 from app.rabbitmq_consumer import consume_order_updates, consume_status_updates  # Importiere den Consumer
 
 app = FastAPI()
@@ -27,4 +28,15 @@ async def create_customer_order(order: CustomerOrderCreate):
 @app.get("/getcustomers")
 async def read_customers_with_orders():
     customers = await get_all_customers_with_orders()
-    return customers
\ No newline at end of file
+    return customers
+
+@app.get("/customers/search")
+async def search_customers(
+    email: Optional[str] = Query(None, description="Exakte E-Mail-Adresse"),
+    phone: Optional[str] = Query(None, description="Telefonnummer, beliebig formatiert"),
+    q: Optional[str] = Query(None, min_length=3, description="Unscharfe Suche in Name und Adresse"),
+    limit: int = Query(20, ge=1, le=100, description="Maximale Anzahl Treffer")
+):
+    if not (email or phone or q):
+        raise HTTPException(status_code=400, detail="Mindestens einer der Parameter email, phone oder q ist erforderlich")
+    return await crud.search_customers(email=email, phone=phone, q=q, limit=limit)
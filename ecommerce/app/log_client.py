@@ -6,7 +6,7 @@ from typing import Dict, Any, Optional
 import aio_pika
 from aio_pika import ExchangeType, Message
 import requests
-from datetime import datetime
+from datetime import datetime, timezone
 
 class SystemInteractionLogger:
     """
@@ -51,10 +51,12 @@ class SystemInteractionLogger:
         interaction_type: str,
         message: Dict[str, Any],
         status: str = "success",
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        duration_ms: Optional[float] = None
     ) -> bool:
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "source_system": self.service_name,
             "target_system": target_system,
             "interaction_type": interaction_type,
@@ -63,6 +65,12 @@ class SystemInteractionLogger:
         }
         if error_message:
             log_entry["error_message"] = error_message
+        if trace_id:
+            # correlation id of the business flow, indexed by the logging service
+            log_entry["trace_id"] = trace_id
+        if duration_ms is not None:
+            # measured duration of the interaction, feeds the per-edge latency histograms
+            log_entry["duration_ms"] = round(duration_ms, 3)
         # try RabbitMQ
         try:
             if not self.connection or self.connection.is_closed:
@@ -74,7 +82,11 @@ class SystemInteractionLogger:
             )
             await exchange.publish(
                 Message(
-                    body=json.dumps(log_entry).encode('utf-8'),
+                    # Envelope fields as headers, payload as body: the logging
+                    # service writes the body bytes through without re-encoding
+                    body=json.dumps(message).encode('utf-8'),
+                    headers={k: v for k, v in log_entry.items() if k != "payload"},
+                    content_type="application/json",
                     delivery_mode=aio_pika.DeliveryMode.PERSISTENT
                 ),
                 routing_key="logging_events"
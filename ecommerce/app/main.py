@@ -1,10 +1,12 @@
 # app/main.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
 from app.models import OrderCreate, OrderResponse, ProductCreate
 from app import crud, rabbitmq, db
 from app.db import Order, async_session
 import asyncio
+import uuid
+from typing import Optional
 from sqlalchemy import select
 
 # FastAPI-Instanz
@@ -20,11 +22,16 @@ async def startup_event():
     loop.create_task(rabbitmq.consume_order_status_updates())
 
 @app.post("/orders", response_model=OrderResponse)
-async def create_order(order: OrderCreate):
+async def create_order(order: OrderCreate, response: Response,
+                       x_trace_id: Optional[str] = Header(None)):
     """
     REST-Endpunkt: Neue Bestellung anlegen.
     Speichert in Postgres und gibt Lieferdatum + Status zurück.
+    Die Trace-ID der Bestellung (vom Aufrufer per X-Trace-Id oder neu erzeugt)
+    wird an alle Folgenachrichten gehängt und im Header X-Trace-Id zurückgegeben.
     """
+    trace_id = x_trace_id or uuid.uuid4().hex
+    response.headers["X-Trace-Id"] = trace_id
     try:
         created_order = await crud.create_order(order)
 
@@ -34,7 +41,8 @@ async def create_order(order: OrderCreate):
             order_date=created_order.order_date,
             total_amount=created_order.total_amount,
             status=created_order.status,
-            customer_id=order.customer_id
+            customer_id=order.customer_id,
+            trace_id=trace_id
         )
 
         return created_order
@@ -0,0 +1,322 @@
+"""
+Load generator for the ERP gRPC service.
+
+Drives ProcessOrder and UpdateOrderStatus at a configurable concurrency,
+request rate and product skew, and reports throughput and p50/p95/p99
+latency per method. By default it starts a local ERP server in-process,
+with a temporary stock ledger and the RabbitMQ publish replaced by an
+in-process fake broker, so results reflect ERP itself:
+
+    python benchmark.py --duration 10 --concurrency 32 --skew 1.1
+    python benchmark.py --server aio --rate 2000 --broker-latency-ms 1
+    python benchmark.py --target localhost:50052   # an already running ERP
+
+With --rate, latencies are measured from each request's scheduled send
+time, so a stalled server is not hidden by the client slowing down.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent import futures
+
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'protos'))
+
+from protos.order_pb2 import OrderRequest, OrderStatusUpdateRequest
+from protos.order_pb2_grpc import OrderServiceStub, add_OrderServiceServicer_to_server
+
+
+class FakeBroker:
+    """Stands in for StatusPublisher: counts published status updates, optionally sleeping per batch."""
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 5.0):
+        pass
+
+    def backlog(self):
+        return 0
+
+    def publish(self, order_id, status, trace_id=None):
+        self.publish_many([(order_id, status)])
+
+    def publish_many(self, updates, trace_ids=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.published += len(updates)
+
+
+class AsyncFakeBroker(FakeBroker):
+    """FakeBroker with the interface of aio_server.AsyncStatusPublisher."""
+    async def publish(self, order_id, status, trace_id=None):
+        await self.publish_many([(order_id, status)])
+
+    async def publish_many(self, updates, trace_ids=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.published += len(updates)
+
+    async def close(self):
+        pass
+
+
+def product_ids(count):
+    return [f"product_{i:03d}" for i in range(1, count + 1)]
+
+
+class ProductPicker:
+    """Picks product ids with a Zipf(skew) distribution; skew 0 is uniform."""
+    def __init__(self, products, skew):
+        self.products = products
+        weights = [1.0 / (rank ** skew) for rank in range(1, len(products) + 1)]
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def pick(self, rng):
+        index = bisect.bisect_left(self.cum_weights, rng.random() * self.cum_weights[-1])
+        return self.products[min(index, len(self.products) - 1)]
+
+
+class LocalServer:
+    """ERP server with a temporary ledger and a fake broker, in this process."""
+    def __init__(self, mode, products, stock, workers, broker_latency_ms):
+        from stock_ledger import StockLedger
+
+        self.mode = mode
+        self.data_dir = tempfile.mkdtemp(prefix="erp-bench-")
+        initial_stock = {product_id: {"name": product_id, "stock": stock} for product_id in products}
+        self.ledger = StockLedger(self.data_dir, initial_stock=initial_stock, snapshot_interval=0)
+        self.broker = None
+        self.port = None
+        self._workers = workers
+        self._broker_latency_ms = broker_latency_ms
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        if self.mode == "aio":
+            self._start_aio()
+        else:
+            from server import OrderService
+
+            self.broker = FakeBroker(self._broker_latency_ms)
+            self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=self._workers))
+            add_OrderServiceServicer_to_server(OrderService(self.broker, self.ledger), self._server)
+            self.port = self._server.add_insecure_port("127.0.0.1:0")
+            self._server.start()
+        return f"127.0.0.1:{self.port}"
+
+    def _start_aio(self):
+        from aio_server import AsyncOrderService
+
+        self.broker = AsyncFakeBroker(self._broker_latency_ms)
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._stop_requested = asyncio.Event()
+
+        async def _run():
+            try:
+                self._server = grpc.aio.server()
+                add_OrderServiceServicer_to_server(AsyncOrderService(self.broker, self.ledger), self._server)
+                self.port = self._server.add_insecure_port("127.0.0.1:0")
+                await self._server.start()
+            finally:
+                ready.set()
+            await self._stop_requested.wait()
+            await self._server.stop(0)
+
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(_run(),),
+                                        name="erp-bench-aio", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self.port is None:
+            raise RuntimeError("Local aio server failed to start")
+
+    def stop(self):
+        if self.mode == "aio":
+            self._loop.call_soon_threadsafe(self._stop_requested.set)
+            self._thread.join()
+        else:
+            self._server.stop(0)
+        self.ledger.close()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}  # method -> [seconds]
+        self.codes = {}      # (method, code name) -> count
+
+    def record(self, method, code, seconds):
+        with self._lock:
+            self.latencies.setdefault(method, []).append(seconds)
+            self.codes[(method, code)] = self.codes.get((method, code), 0) + 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _worker(stub, args, picker, schedule, deadline, stats, seed):
+    rng = random.Random(seed)
+    shipped = []
+    while True:
+        if schedule is not None:
+            scheduled = schedule()
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            scheduled = time.perf_counter()
+            if scheduled >= deadline:
+                return
+
+        if shipped and rng.random() < args.update_ratio:
+            method = "UpdateOrderStatus"
+            call = lambda: stub.UpdateOrderStatus(OrderStatusUpdateRequest(
+                order_id=rng.choice(shipped), status=rng.randint(1, 3)), timeout=args.timeout)
+        else:
+            method = "ProcessOrder"
+            order_id = str(uuid.uuid4())
+            call = lambda: stub.ProcessOrder(OrderRequest(
+                order_id=order_id, product_id=picker.pick(rng), quantity=args.quantity), timeout=args.timeout)
+
+        try:
+            call()
+            code = "OK"
+            if method == "ProcessOrder":
+                shipped.append(order_id)
+                if len(shipped) > 1000:
+                    shipped.pop(0)
+        except grpc.RpcError as e:
+            code = e.code().name
+        stats.record(method, code, time.perf_counter() - scheduled)
+
+
+def run(args):
+    products = product_ids(args.products)
+    picker = ProductPicker(products, args.skew)
+    local = None
+    target = args.target
+    if target is None:
+        local = LocalServer(args.server, products, args.stock, args.server_workers, args.broker_latency_ms)
+        target = local.start()
+
+    stats = Stats()
+    schedule = None
+    channel = grpc.insecure_channel(target)
+    try:
+        grpc.channel_ready_future(channel).result(timeout=10)
+        stub = OrderServiceStub(channel)
+        start = time.perf_counter() + 0.1
+        deadline = start + args.duration
+        if args.rate > 0:
+            # Shared open-loop schedule: request k is due at start + k / rate
+            counter = itertools.count()
+            schedule_lock = threading.Lock()
+
+            def schedule():
+                with schedule_lock:
+                    return start + next(counter) / args.rate
+
+        threads = [
+            threading.Thread(target=_worker, args=(stub, args, picker, schedule, deadline, stats, args.seed + i))
+            for i in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        channel.close()
+        if local is not None:
+            local.stop()
+
+    report = {
+        "target": target if local is None else f"local {args.server} server",
+        "duration_s": round(elapsed, 3),
+        "concurrency": args.concurrency,
+        "rate": args.rate or None,
+        "skew": args.skew,
+        "methods": {},
+    }
+    for method, latencies in sorted(stats.latencies.items()):
+        latencies.sort()
+        report["methods"][method] = {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "codes": {code: count for (m, code), count in sorted(stats.codes.items()) if m == method},
+        }
+    if local is not None:
+        report["fake_broker_published"] = local.broker.published
+    return report
+
+
+def print_report(report):
+    print(f"target: {report['target']}  duration: {report['duration_s']}s  "
+          f"concurrency: {report['concurrency']}  rate: {report['rate'] or 'unlimited'}  skew: {report['skew']}")
+    print(f"{'method':<20}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  codes")
+    for method, row in report["methods"].items():
+        codes = ", ".join(f"{code}={count}" for code, count in row["codes"].items())
+        print(f"{method:<20}{row['requests']:>10}{row['throughput_rps']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}  {codes}")
+    if "fake_broker_published" in report:
+        print(f"status updates published to fake broker: {report['fake_broker_published']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the ERP gRPC service")
+    parser.add_argument("--target", help="host:port of a running ERP; default starts a local server")
+    parser.add_argument("--server", choices=("sync", "aio"), default="sync", help="local server mode")
+    parser.add_argument("--server-workers", type=int, default=10, help="thread pool size of the local sync server")
+    parser.add_argument("--broker-latency-ms", type=float, default=0.0, help="simulated publish latency of the fake broker")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--rate", type=float, default=0.0, help="total requests per second (0 = as fast as possible)")
+    parser.add_argument("--products", type=int, default=100, help="number of products")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of product popularity (0 = uniform)")
+    parser.add_argument("--stock", type=int, default=10_000_000, help="initial stock per product on the local server")
+    parser.add_argument("--quantity", type=int, default=1, help="quantity per order")
+    parser.add_argument("--update-ratio", type=float, default=0.2, help="fraction of UpdateOrderStatus calls")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-RPC deadline in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from publisher import PublisherBufferFull
+
+# Coalescing window in milliseconds; 0 disables the coalescing stage
+COALESCE_WINDOW_MS = float(os.getenv("ERP_STATUS_COALESCE_MS", "0"))
+# Max. orders with a pending status; beyond it publishers block, then get PublisherBufferFull
+COALESCE_MAX_PENDING = int(os.getenv("ERP_STATUS_COALESCE_MAX_PENDING", "10000"))
+
+
+class CoalescingBuffer:
+    """
+    Keeps one pending status per order_id. Statuses only move forward
+    (1 Processed -> 2 Shipped -> 3 Cancelled): a lower status arriving after
+    a higher one for the same order is dropped, an equal or higher one wins.
+    Orders are published in the order they first entered the window. The last
+    trace id seen for an order travels with its surviving status.
+    Not thread-safe; the coalescers guard it.
+    """
+    def __init__(self):
+        self._pending = {}
+        self._traces = {}
+        self.received = 0
+        self.published = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def growth(self, updates):
+        """Number of orders the updates would add to the pending set."""
+        return len({order_id for order_id, _ in updates if order_id not in self._pending})
+
+    def add(self, updates, trace_ids=None):
+        for order_id, status in updates:
+            self.received += 1
+            current = self._pending.get(order_id)
+            if current is None or status >= current:
+                self._pending[order_id] = status
+            if trace_ids and order_id in trace_ids:
+                self._traces[order_id] = trace_ids[order_id]
+
+    def requeue(self, updates, trace_ids):
+        """Puts back drained updates whose publish failed; newer pending statuses still win."""
+        self.published -= len(updates)
+        for order_id, status in updates:
+            current = self._pending.get(order_id)
+            if current is None or status > current:
+                self._pending[order_id] = status
+            if order_id in trace_ids:
+                self._traces.setdefault(order_id, trace_ids[order_id])
+
+    def drain(self):
+        """Returns the surviving (order_id, status) updates and their trace ids."""
+        updates = list(self._pending.items())
+        trace_ids = self._traces
+        self._pending = {}
+        self._traces = {}
+        self.published += len(updates)
+        return updates, trace_ids
+
+
+class StatusCoalescer:
+    """
+    Optional stage in front of publisher.StatusPublisher: buffers status updates
+    for window_ms, keeps only the surviving status per order and hands the
+    survivors to the publisher as one batch. Same publish interface as the publisher,
+    including its backpressure: when max_pending orders are waiting (e.g. while the
+    broker is down and flushes are requeued), publish_many blocks for at most
+    enqueue_timeout and then raises PublisherBufferFull.
+    """
+    def __init__(self, publisher, window_ms: float = COALESCE_WINDOW_MS,
+                 max_pending: int = COALESCE_MAX_PENDING, enqueue_timeout: float = 1.0):
+        self.publisher = publisher
+        self.window = window_ms / 1000.0
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self._buffer = CoalescingBuffer()
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="erp-status-coalescer", daemon=True)
+
+    def start(self):
+        self.publisher.start()
+        self._thread.start()
+
+    def publish(self, order_id, status, trace_id=None):
+        self.publish_many([(order_id, status)], {order_id: trace_id} if trace_id else None)
+
+    def publish_many(self, updates, trace_ids=None):
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._lock:
+            # Updates for orders that are already pending never need room
+            while len(self._buffer) and len(self._buffer) + self._buffer.growth(updates) > self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PublisherBufferFull(f"Status coalescer full ({self.max_pending} pending orders)")
+                self._drained.wait(remaining)
+            self._buffer.add(updates, trace_ids)
+
+    def backlog(self):
+        return self.publisher.backlog()
+
+    def _flush(self):
+        with self._lock:
+            updates, trace_ids = self._buffer.drain()
+            self._drained.notify_all()
+        if not updates:
+            return
+        try:
+            self.publisher.publish_many(updates, trace_ids)
+        except Exception as e:
+            # Put the survivors back; newer updates that arrived meanwhile still win
+            logging.warning(f"Coalesced status flush failed ({e}), retrying next window")
+            with self._lock:
+                self._buffer.requeue(updates, trace_ids)
+
+    def _run(self):
+        while not self._stopping.wait(self.window):
+            self._flush()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._flush()
+        self.publisher.stop(timeout)
+        logging.info(f"Status coalescer published {self._buffer.published} of {self._buffer.received} updates")
+
+
+class AsyncStatusCoalescer:
+    """asyncio counterpart of StatusCoalescer for aio_server.AsyncStatusPublisher."""
+    def __init__(self, publisher, window_ms: float = COALESCE_WINDOW_MS,
+                 max_pending: int = COALESCE_MAX_PENDING, enqueue_timeout: float = 1.0):
+        self.publisher = publisher
+        self.window = window_ms / 1000.0
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self._buffer = CoalescingBuffer()
+        self._drained = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    async def publish(self, order_id, status, trace_id=None):
+        await self.publish_many([(order_id, status)], {order_id: trace_id} if trace_id else None)
+
+    async def publish_many(self, updates, trace_ids=None):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        deadline = time.monotonic() + self.enqueue_timeout
+        while len(self._buffer) and len(self._buffer) + self._buffer.growth(updates) > self.max_pending:
+            remaining = deadline - time.monotonic()
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                raise PublisherBufferFull(f"Status coalescer full ({self.max_pending} pending orders)")
+        self._buffer.add(updates, trace_ids)
+
+    async def _flush(self):
+        updates, trace_ids = self._buffer.drain()
+        self._drained.set()
+        if not updates:
+            return
+        try:
+            await self.publisher.publish_many(updates, trace_ids)
+        except asyncio.CancelledError:
+            # Only close() cancels, after its timeout; its final flush retries these
+            self._buffer.requeue(updates, trace_ids)
+            raise
+        except Exception as e:
+            logging.warning(f"Coalesced status flush failed ({e}), retrying next window")
+            self._buffer.requeue(updates, trace_ids)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.window)
+            except asyncio.TimeoutError:
+                await self._flush()
+
+    async def close(self, timeout: float = 5.0):
+        # Let the loop exit on its own so an in-flight flush completes, then flush the rest
+        self._stopping.set()
+        if self._task is not None:
+            await asyncio.wait([self._task], timeout=timeout)
+            if not self._task.done():
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+        await self._flush()
+        await self.publisher.close()
+        logging.info(f"Status coalescer published {self._buffer.published} of {self._buffer.received} updates")
@@ -0,0 +1,282 @@
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+
+METRICS_PORT = int(os.getenv("ERP_METRICS_PORT", "50053"))
+
+# Latency buckets in seconds, from sub-millisecond stock updates to slow broker round trips
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store for the ERP gRPC server, rendered in the
+    Prometheus text exposition format. All updates go through one lock; they
+    are a handful of integer operations, far below the cost of an RPC.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}      # method -> Histogram
+        self._phases = {}       # phase -> Histogram
+        self._in_flight = {}    # method -> int
+        self._codes = {}        # (method, code name) -> int
+        self._callbacks = {}    # name -> (type, help, callable)
+
+    def rpc_started(self, method):
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def rpc_finished(self, method, code, seconds):
+        with self._lock:
+            self._in_flight[method] -= 1
+            self._latency.setdefault(method, Histogram()).observe(seconds)
+            key = (method, code.name if code is not None else "OK")
+            self._codes[key] = self._codes.get(key, 0) + 1
+
+    def observe_phase(self, phase, seconds):
+        with self._lock:
+            self._phases.setdefault(phase, Histogram()).observe(seconds)
+
+    @contextmanager
+    def time_phase(self, phase):
+        """Times a section inside a handler, e.g. stock locking vs. broker publish."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - start)
+
+    def register_gauge(self, name, help_text, read):
+        """Registers a gauge whose value is read at scrape time."""
+        self._callbacks[name] = ("gauge", help_text, read)
+
+    def register_counter(self, name, help_text, read):
+        """Registers a monotonically increasing counter (name ending in _total) read at scrape time."""
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter name must end in _total: {name}")
+        self._callbacks[name] = ("counter", help_text, read)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, "erp_grpc_server_handling_seconds",
+                                    "Latency of completed RPCs by method", "grpc_method", self._latency)
+            self._render_histograms(lines, "erp_order_phase_seconds",
+                                    "Time spent in phases of order handling", "phase", self._phases)
+            lines.append("# HELP erp_grpc_server_in_flight RPCs currently being handled")
+            lines.append("# TYPE erp_grpc_server_in_flight gauge")
+            for method, value in sorted(self._in_flight.items()):
+                lines.append(f"erp_grpc_server_in_flight{_labels(grpc_method=method)} {value}")
+            lines.append("# HELP erp_grpc_server_handled_total Completed RPCs by method and status code")
+            lines.append("# TYPE erp_grpc_server_handled_total counter")
+            for (method, code), value in sorted(self._codes.items()):
+                lines.append(f"erp_grpc_server_handled_total{_labels(grpc_method=method, grpc_code=code)} {value}")
+        for name, (kind, help_text, read) in sorted(self._callbacks.items()):
+            try:
+                value = read()
+            except Exception as e:
+                logging.warning(f"Metrics {kind} {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, label, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**{label: key, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(**{label: key, 'le': '+Inf'})} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(**{label: key})} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(**{label: key})} {histogram.count}")
+
+
+# Singleton registry shared by the servers, the servicer and the HTTP endpoint
+registry = MetricsRegistry()
+
+
+def _method_name(handler_call_details):
+    # '/erp.OrderService/ProcessOrder' -> 'ProcessOrder'
+    return handler_call_details.method.rsplit("/", 1)[-1]
+
+
+def _code_of(context, error=None):
+    code = context.code()
+    if code is None and error is not None:
+        return grpc.StatusCode.UNKNOWN
+    return code
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records latency, in-flight count and status code of every RPC on the sync server."""
+    def __init__(self, metrics: MetricsRegistry = registry):
+        self.metrics = metrics
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details)
+        metrics = self.metrics
+
+        def wrap_unary(behavior):
+            def wrapper(request_or_iterator, context):
+                metrics.rpc_started(method)
+                start = time.perf_counter()
+                error = None
+                try:
+                    return behavior(request_or_iterator, context)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.rpc_finished(method, _code_of(context, error), time.perf_counter() - start)
+            return wrapper
+
+        def wrap_stream(behavior):
+            def wrapper(request_or_iterator, context):
+                metrics.rpc_started(method)
+                start = time.perf_counter()
+                error = None
+                try:
+                    yield from behavior(request_or_iterator, context)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.rpc_finished(method, _code_of(context, error), time.perf_counter() - start)
+            return wrapper
+
+        return _wrap_handler(handler, wrap_unary, wrap_stream)
+
+
+class AioMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of MetricsInterceptor."""
+    def __init__(self, metrics: MetricsRegistry = registry):
+        self.metrics = metrics
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = _method_name(handler_call_details)
+        metrics = self.metrics
+
+        def wrap_unary(behavior):
+            async def wrapper(request_or_iterator, context):
+                metrics.rpc_started(method)
+                start = time.perf_counter()
+                error = None
+                try:
+                    # Handlers inherited from the sync servicer return plain values
+                    response = behavior(request_or_iterator, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    return response
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.rpc_finished(method, _code_of(context, error), time.perf_counter() - start)
+            return wrapper
+
+        def wrap_stream(behavior):
+            async def wrapper(request_or_iterator, context):
+                metrics.rpc_started(method)
+                start = time.perf_counter()
+                error = None
+                try:
+                    responses = behavior(request_or_iterator, context)
+                    if hasattr(responses, "__aiter__"):
+                        async for response in responses:
+                            yield response
+                    else:
+                        for response in responses:
+                            yield response
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.rpc_finished(method, _code_of(context, error), time.perf_counter() - start)
+            return wrapper
+
+        return _wrap_handler(handler, wrap_unary, wrap_stream)
+
+
+def _wrap_handler(handler, wrap_unary, wrap_stream):
+    # wrap_unary for handlers returning one response, wrap_stream for response streams
+    if handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(
+            wrap_unary(handler.unary_unary),
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer)
+    if handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(
+            wrap_unary(handler.stream_unary),
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer)
+    if handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(
+            wrap_stream(handler.unary_stream),
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer)
+    return grpc.stream_stream_rpc_method_handler(
+        wrap_stream(handler.stream_stream),
+        request_deserializer=handler.request_deserializer,
+        response_serializer=handler.response_serializer)
+
+
+def start_metrics_server(port: int = METRICS_PORT, metrics: MetricsRegistry = registry):
+    """Serves GET /metrics in Prometheus text format on a daemon thread."""
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("", port), _Handler)
+    threading.Thread(target=httpd.serve_forever, name="erp-metrics-http", daemon=True).start()
+    logging.info(f"Metrics endpoint running on port {port} (/metrics)")
+    return httpd
@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0border.proto\x12\x03\x65rp\x1a\x1bgoogle/protobuf/empty.proto\"F\n\x0cOrderRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x12\n\nproduct_id\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\"<\n\rOrderResponse\x12\x15\n\rshipping_date\x18\x01 \x01(\t\x12\x14\n\x0corder_status\x18\x02 \x01(\t\"<\n\x18OrderStatusUpdateRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\x05\x32\x91\x01\n\x0cOrderService\x12\x35\n\x0cProcessOrder\x12\x11.erp.OrderRequest\x1a\x12.erp.OrderResponse\x12J\n\x11UpdateOrderStatus\x12\x1d.erp.OrderStatusUpdateRequest\x1a\x16.google.protobuf.Emptyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0border.proto\x12\x03\x65rp\x1a\x1bgoogle/protobuf/empty.proto\"F\n\x0cOrderRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x12\n\nproduct_id\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\"<\n\rOrderResponse\x12\x15\n\rshipping_date\x18\x01 \x01(\t\x12\x14\n\x0corder_status\x18\x02 \x01(\t\"<\n\x18OrderStatusUpdateRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\x05\"d\n\x0bOrderResult\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12$\n\x08response\x18\x02 \x01(\x0b\x32\x12.erp.OrderResponse\x12\x0c\n\x04\x63ode\x18\x03 \x01(\x05\x12\x0f\n\x07\x64\x65tails\x18\x04 \x01(\t\"6\n\x11OrderBatchRequest\x12!\n\x06orders\x18\x01 \x03(\x0b\x32\x11.erp.OrderRequest\"7\n\x12OrderBatchResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.erp.OrderResult\"\"\n\x0cStockRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\"L\n\nStockLevel\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05stock\x18\x03 \x01(\x05\x12\r\n\x05\x66ound\x18\x04 \x01(\x08\"(\n\x11\x42\x61tchStockRequest\x12\x13\n\x0bproduct_ids\x18\x01 \x03(\t\"4\n\x12\x42\x61tchStockResponse\x12\x1e\n\x05items\x18\x01 \x03(\x0b\x32\x0f.erp.StockLevel2\x83\x03\n\x0cOrderService\x12\x35\n\x0cProcessOrder\x12\x11.erp.OrderRequest\x1a\x12.erp.OrderResponse\x12J\n\x11UpdateOrderStatus\x12\x1d.erp.OrderStatusUpdateRequest\x1a\x16.google.protobuf.Empty\x12\x38\n\rProcessOrders\x12\x11.erp.OrderRequest\x1a\x10.erp.OrderResult(\x01\x30\x01\x12\x44\n\x11ProcessOrderBatch\x12\x16.erp.OrderBatchRequest\x1a\x17.erp.OrderBatchResponse\x12.\n\x08GetStock\x12\x11.erp.StockRequest\x1a\x0f.erp.StockLevel\x12@\n\rBatchGetStock\x12\x16.erp.BatchStockRequest\x1a\x17.erp.BatchStockResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -38,6 +38,20 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_ORDERRESPONSE']._serialized_end=181
   _globals['_ORDERSTATUSUPDATEREQUEST']._serialized_start=183
   _globals['_ORDERSTATUSUPDATEREQUEST']._serialized_end=243
-  _globals['_ORDERSERVICE']._serialized_start=246
-  _globals['_ORDERSERVICE']._serialized_end=391
+  _globals['_ORDERRESULT']._serialized_start=245
+  _globals['_ORDERRESULT']._serialized_end=345
+  _globals['_ORDERBATCHREQUEST']._serialized_start=347
+  _globals['_ORDERBATCHREQUEST']._serialized_end=401
+  _globals['_ORDERBATCHRESPONSE']._serialized_start=403
+  _globals['_ORDERBATCHRESPONSE']._serialized_end=458
+  _globals['_STOCKREQUEST']._serialized_start=460
+  _globals['_STOCKREQUEST']._serialized_end=494
+  _globals['_STOCKLEVEL']._serialized_start=496
+  _globals['_STOCKLEVEL']._serialized_end=572
+  _globals['_BATCHSTOCKREQUEST']._serialized_start=574
+  _globals['_BATCHSTOCKREQUEST']._serialized_end=614
+  _globals['_BATCHSTOCKRESPONSE']._serialized_start=616
+  _globals['_BATCHSTOCKRESPONSE']._serialized_end=668
+  _globals['_ORDERSERVICE']._serialized_start=671
+  _globals['_ORDERSERVICE']._serialized_end=1058
 # @@protoc_insertion_point(module_scope)
@@ -45,6 +45,26 @@ class OrderServiceStub(object):
                 request_serializer=order__pb2.OrderStatusUpdateRequest.SerializeToString,
                 response_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
                 _registered_method=True)
+        self.ProcessOrders = channel.stream_stream(
+                '/erp.OrderService/ProcessOrders',
+                request_serializer=order__pb2.OrderRequest.SerializeToString,
+                response_deserializer=order__pb2.OrderResult.FromString,
+                _registered_method=True)
+        self.ProcessOrderBatch = channel.unary_unary(
+                '/erp.OrderService/ProcessOrderBatch',
+                request_serializer=order__pb2.OrderBatchRequest.SerializeToString,
+                response_deserializer=order__pb2.OrderBatchResponse.FromString,
+                _registered_method=True)
+        self.GetStock = channel.unary_unary(
+                '/erp.OrderService/GetStock',
+                request_serializer=order__pb2.StockRequest.SerializeToString,
+                response_deserializer=order__pb2.StockLevel.FromString,
+                _registered_method=True)
+        self.BatchGetStock = channel.unary_unary(
+                '/erp.OrderService/BatchGetStock',
+                request_serializer=order__pb2.BatchStockRequest.SerializeToString,
+                response_deserializer=order__pb2.BatchStockResponse.FromString,
+                _registered_method=True)
 
 
 class OrderServiceServicer(object):
@@ -62,6 +82,32 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ProcessOrders(self, request_iterator, context):
+        """Stock is applied per micro-batch of the incoming stream, one result per order is streamed back
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ProcessOrderBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStock(self, request, context):
+        """Served from an immutable stock snapshot, never waits for ProcessOrder writers
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchGetStock(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -75,6 +121,26 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=order__pb2.OrderStatusUpdateRequest.FromString,
                     response_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
             ),
+            'ProcessOrders': grpc.stream_stream_rpc_method_handler(
+                    servicer.ProcessOrders,
+                    request_deserializer=order__pb2.OrderRequest.FromString,
+                    response_serializer=order__pb2.OrderResult.SerializeToString,
+            ),
+            'ProcessOrderBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ProcessOrderBatch,
+                    request_deserializer=order__pb2.OrderBatchRequest.FromString,
+                    response_serializer=order__pb2.OrderBatchResponse.SerializeToString,
+            ),
+            'GetStock': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStock,
+                    request_deserializer=order__pb2.StockRequest.FromString,
+                    response_serializer=order__pb2.StockLevel.SerializeToString,
+            ),
+            'BatchGetStock': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetStock,
+                    request_deserializer=order__pb2.BatchStockRequest.FromString,
+                    response_serializer=order__pb2.BatchStockResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'erp.OrderService', rpc_method_handlers)
@@ -139,3 +205,111 @@ class OrderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ProcessOrders(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/erp.OrderService/ProcessOrders',
+            order__pb2.OrderRequest.SerializeToString,
+            order__pb2.OrderResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ProcessOrderBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/erp.OrderService/ProcessOrderBatch',
+            order__pb2.OrderBatchRequest.SerializeToString,
+            order__pb2.OrderBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetStock(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/erp.OrderService/GetStock',
+            order__pb2.StockRequest.SerializeToString,
+            order__pb2.StockLevel.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchGetStock(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/erp.OrderService/BatchGetStock',
+            order__pb2.BatchStockRequest.SerializeToString,
+            order__pb2.BatchStockResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
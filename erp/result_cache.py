@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+RESULT_CACHE_TTL = float(os.getenv("ERP_RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_SIZE = int(os.getenv("ERP_RESULT_CACHE_SIZE", "100000"))
+
+
+class OrderResultCache:
+    """
+    order_id -> OrderResponse of successfully processed orders, so a retried
+    ProcessOrder is answered with the original response instead of taking
+    stock and publishing "Shipped" again.
+
+    Entries expire after ttl seconds and the oldest are evicted beyond
+    max_entries. Callers hold locks_for(order_ids) around check-apply-store,
+    which makes concurrent retries of the same order wait for the first one
+    instead of both applying it. On a grpc.aio event loop async_locks_for
+    does the same without blocking the loop while the order is applied.
+    """
+    def __init__(self, ttl: float = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_SIZE, stripes: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._async_stripes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def locks_for(self, order_ids):
+        stripe_ids = sorted({zlib.crc32(order_id.encode("utf-8")) % len(self._stripes) for order_id in order_ids})
+        for stripe_id in stripe_ids:
+            self._stripes[stripe_id].acquire()
+        try:
+            yield
+        finally:
+            for stripe_id in reversed(stripe_ids):
+                self._stripes[stripe_id].release()
+
+    @asynccontextmanager
+    async def async_locks_for(self, order_ids):
+        if self._async_stripes is None:
+            # Created on first use, so the locks belong to the serving event loop
+            self._async_stripes = [asyncio.Lock() for _ in range(len(self._stripes))]
+        stripe_ids = sorted({zlib.crc32(order_id.encode("utf-8")) % len(self._stripes) for order_id in order_ids})
+        acquired = []
+        try:
+            for stripe_id in stripe_ids:
+                await self._async_stripes[stripe_id].acquire()
+                acquired.append(stripe_id)
+            yield
+        finally:
+            for stripe_id in reversed(acquired):
+                self._async_stripes[stripe_id].release()
+
+    def get(self, order_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(order_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, order_id, response):
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(order_id, None)
+            self._entries[order_id] = (now + self.ttl, response)
+            # Insertion order is expiry order (fixed ttl), so both expired and
+            # overflowing entries are at the front
+            while self._entries:
+                expires_at, _ = next(iter(self._entries.values()))
+                if expires_at > now and len(self._entries) <= self.max_entries:
+                    break
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
@@ -3,96 +3,348 @@ import grpc
 from concurrent import futures
 import logging
 from datetime import datetime
-import pika
+import queue
+import threading
+import time
 import sys
 import os
-import json
 
 # Add the protos directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'protos'))
 
-from protos.order_pb2 import OrderResponse, OrderStatusUpdateRequest
+from protos.order_pb2 import (
+    OrderResponse, OrderStatusUpdateRequest, OrderResult, OrderBatchResponse, StockLevel, BatchStockResponse
+)
 from google.protobuf.empty_pb2 import Empty
 from protos.order_pb2_grpc import OrderServiceServicer, add_OrderServiceServicer_to_server
+from publisher import StatusPublisher, InteractionLogPublisher, TRACE_METADATA_KEY
+from coalescer import StatusCoalescer, COALESCE_WINDOW_MS
+from stock_ledger import StockLedger, UnknownProduct, InsufficientStock
+from metrics import registry as metrics, MetricsInterceptor, start_metrics_server, METRICS_PORT
+from result_cache import OrderResultCache
+
+SHIPPED_STATUS = 2 # Shipped
+
+# Upper bound for the micro-batches ProcessOrders applies from its request stream
+STREAM_BATCH_SIZE = int(os.getenv("ERP_STREAM_BATCH_SIZE", "100"))
+
+# Seed stock for a fresh ledger (no snapshot or journal in ERP_DATA_DIR yet)
+DEFAULT_STOCK = {
+    "product_001": {"name": "Product 1", "stock": 100},
+    "product_002": {"name": "Product 2", "stock": 50}
+}
 
 class OrderService(OrderServiceServicer):
-    def __init__(self):
-        self.stock_db = {
-            "product_001": {"name": "Product 1", "stock": 100},
-            "product_002": {"name": "Product 2", "stock": 50}
-        }
+    def __init__(self, publisher=None, ledger=None, results=None, interaction_log=None):
+        self.publisher = publisher
+        self.ledger = ledger if ledger is not None else StockLedger(initial_stock=DEFAULT_STOCK)
+        self.results = results if results is not None else OrderResultCache()
+        # InteractionLogPublisher for the ERP's hop in a trace; None disables it
+        self.interaction_log = interaction_log
 
     def ProcessOrder(self, request, context):
-        product = self.stock_db.get(request.product_id)
-        if not product:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details("Product not found")
+        started = time.perf_counter()
+        trace_id = trace_id_from_context(context)
+        with metrics.time_phase("stock"):
+            response, replayed = self.apply_order_once(request, context)
+        if response is None:
+            self.log_order(request, context, trace_id, started, None, False)
             return OrderResponse()
 
-        if product['stock'] < request.quantity:
-            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
-            context.set_details("Insufficient stock")
-            return OrderResponse()
+        if not replayed:
+            with metrics.time_phase("publish"):
+                self.publish_status_update(request.order_id, SHIPPED_STATUS, trace_id)
+
+        self.log_order(request, context, trace_id, started, response, replayed)
+        return response
+
+    def log_order(self, request, context, trace_id, started, response, replayed):
+        """Logs the ProcessOrder hop to the logging service, under the caller's trace id."""
+        if self.interaction_log is None:
+            return
+        message = {"order_id": request.order_id, "product_id": request.product_id, "quantity": request.quantity}
+        error_message = None
+        if response is None:
+            details = context.details()
+            error_message = details.decode("utf-8") if isinstance(details, bytes) else details
+        else:
+            message.update(order_status=response.order_status, shipping_date=response.shipping_date,
+                           replayed=replayed)
+        self.interaction_log.log_interaction(
+            target_system="erp",
+            interaction_type="process_order",
+            message=message,
+            status="ERROR" if response is None else "SUCCESS",
+            error_message=error_message,
+            trace_id=trace_id,
+            duration_ms=(time.perf_counter() - started) * 1000
+        )
+
+    def apply_order_once(self, request, context):
+        """
+        apply_order keyed by order_id: a retried order gets its original response
+        from the result cache without touching stock. Returns (response, replayed).
+        """
+        if not request.order_id:
+            return self.apply_order(request, context), False
+        with self.results.locks_for([request.order_id]):
+            cached = self.results.get(request.order_id)
+            if cached is not None:
+                return cached, True
+            response = self.apply_order(request, context)
+            if response is not None:
+                self.results.put(request.order_id, response)
+            return response, False
+
+    def apply_order(self, request, context):
+        """
+        Checks and decrements stock for an order. Shared by the sync and the async server.
+        Returns the OrderResponse, or None after setting the error code on the context.
+        """
+        try:
+            self.ledger.try_decrement(request.product_id, request.quantity)
+        except (UnknownProduct, InsufficientStock) as e:
+            return reject_order(context, e)
+        return shipped_response()
+
+    def apply_batch(self, requests):
+        """
+        Applies stock for a batch of orders with one ledger call. Orders already in
+        the result cache, or repeated within the batch, are answered without
+        taking stock again. Returns the per-order results and the
+        (order_id, status) updates to publish.
+        """
+        with self.results.locks_for([r.order_id for r in requests if r.order_id]):
+            responses, first_index, to_apply = self.plan_batch(requests)
+            outcomes = self.ledger.try_decrement_batch(
+                [(requests[i].product_id, requests[i].quantity) for i in to_apply])
+            return self.finish_batch(requests, responses, first_index, dict(zip(to_apply, outcomes)))
 
-        product['stock'] -= request.quantity
+    def plan_batch(self, requests):
+        """
+        Looks up a batch in the result cache (caller holds its locks). Returns the
+        cached responses by index, the first index of every order_id and the
+        indexes whose stock still has to be applied.
+        """
+        responses = {}   # index -> cached OrderResponse
+        first_index = {} # order_id -> index of its first occurrence in the batch
+        to_apply = []
+        for i, request in enumerate(requests):
+            if request.order_id and request.order_id in first_index:
+                continue
+            if request.order_id:
+                first_index[request.order_id] = i
+                cached = self.results.get(request.order_id)
+                if cached is not None:
+                    responses[i] = cached
+                    continue
+            to_apply.append(i)
+        return responses, first_index, to_apply
+
+    def finish_batch(self, requests, responses, first_index, outcomes):
+        """Turns the ledger outcomes of plan_batch's orders into results and caches the shipped ones."""
         shipping_date = datetime.now().strftime("%Y-%m-%d")
-        order_status = 2 # Shipped
+        results = []
+        updates = []
+        for i, request in enumerate(requests):
+            source = first_index.get(request.order_id, i)
+            if source in responses:
+                results.append(OrderResult(order_id=request.order_id, response=responses[source]))
+                continue
+            outcome = outcomes[source]
+            if isinstance(outcome, UnknownProduct):
+                results.append(OrderResult(order_id=request.order_id,
+                                           code=grpc.StatusCode.NOT_FOUND.value[0],
+                                           details="Product not found"))
+            elif isinstance(outcome, InsufficientStock):
+                results.append(OrderResult(order_id=request.order_id,
+                                           code=grpc.StatusCode.FAILED_PRECONDITION.value[0],
+                                           details="Insufficient stock"))
+            else:
+                response = OrderResponse(shipping_date=shipping_date, order_status=str(SHIPPED_STATUS))
+                responses[source] = response
+                if request.order_id:
+                    self.results.put(request.order_id, response)
+                results.append(OrderResult(order_id=request.order_id, response=response))
+                updates.append((request.order_id, SHIPPED_STATUS))
+        return results, updates
 
-        self.publish_status_update(request.order_id, order_status)
+    def process_batch(self, requests):
+        with metrics.time_phase("stock"):
+            results, updates = self.apply_batch(requests)
+        with metrics.time_phase("publish"):
+            self.publisher.publish_many(updates)
+        return results
 
-        return OrderResponse(
-            shipping_date=shipping_date,
-            order_status=order_status
-        )
+    def ProcessOrderBatch(self, request, context):
+        return OrderBatchResponse(results=self.process_batch(list(request.orders)))
 
-    def publish_status_update(self, order_id, status):
-        connection = pika.BlockingConnection(pika.ConnectionParameters('rabbitmq'))
-        channel = connection.channel()
-        # declare fanout exchange for order status updates
-        channel.exchange_declare(exchange='order_updates_exchange', exchange_type='fanout', durable=True)
-
-        message = {
-            "order_id": order_id,
-            "status": status
-        }
-
-        # publish to the exchange with empty routing key for fanout
-        channel.basic_publish(
-            exchange='order_updates_exchange',
-            routing_key='',
-            body=json.dumps(message)
-        )
+    def ProcessOrders(self, request_iterator, context):
+        for batch in iter_micro_batches(request_iterator, STREAM_BATCH_SIZE):
+            for result in self.process_batch(batch):
+                yield result
 
-        connection.close()
+    def GetStock(self, request, context):
+        entry = self.ledger.view().get(request.product_id)
+        if entry is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Product not found")
+            return StockLevel()
+        return StockLevel(product_id=request.product_id, name=entry[0], stock=entry[1], found=True)
 
-        logging.info(f"Published status update for order {order_id}: {status}")
+    def BatchGetStock(self, request, context):
+        # One view for the whole batch, so all items come from the same point in time
+        view = self.ledger.view()
+        items = []
+        for product_id in request.product_ids:
+            entry = view.get(product_id)
+            if entry is None:
+                items.append(StockLevel(product_id=product_id, found=False))
+            else:
+                items.append(StockLevel(product_id=product_id, name=entry[0], stock=entry[1], found=True))
+        return BatchStockResponse(items=items)
+
+    def publish_status_update(self, order_id, status, trace_id=None):
+        # Only enqueues; the publisher thread sends it over its persistent connection
+        self.publisher.publish(order_id, status, trace_id)
 
     def UpdateOrderStatus(self, request: OrderStatusUpdateRequest, context) -> Empty:
         """
         Receives order status updates via gRPC and publishes to RabbitMQ exchange.
         """
         try:
-            self.publish_status_update(request.order_id, request.status)
+            self.publish_status_update(request.order_id, request.status, trace_id_from_context(context))
             return Empty()
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(str(e))
             return Empty()
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_OrderServiceServicer_to_server(OrderService(), server)
-    server.add_insecure_port('[::]:50052')
-    logging.info("gRPC server running on port 50052")
+def shipped_response():
+    return OrderResponse(
+        shipping_date=datetime.now().strftime("%Y-%m-%d"),
+        order_status=str(SHIPPED_STATUS)
+    )
+
+def reject_order(context, error):
+    """Sets the gRPC error for a rejected order on the context and returns None."""
+    if isinstance(error, UnknownProduct):
+        context.set_code(grpc.StatusCode.NOT_FOUND)
+        context.set_details("Product not found")
+    else:
+        context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+        context.set_details("Insufficient stock")
+    return None
+
+def register_result_cache_metrics(results):
+    metrics.register_counter("erp_result_cache_hits_total", "ProcessOrder retries answered from the result cache",
+                             lambda: results.hits)
+    metrics.register_counter("erp_result_cache_misses_total", "Result cache lookups that had to process the order",
+                             lambda: results.misses)
+    metrics.register_counter("erp_result_cache_evictions_total", "Result cache entries expired or evicted",
+                             lambda: results.evictions)
+    metrics.register_gauge("erp_result_cache_entries", "Orders currently in the result cache", results.__len__)
+
+def trace_id_from_context(context):
+    """Trace id the caller sent as gRPC metadata, forwarded with the status update; None without one."""
+    for item in context.invocation_metadata() or ():
+        if item.key == TRACE_METADATA_KEY:
+            return item.value
+    return None
+
+def iter_micro_batches(request_iterator, max_size):
+    """
+    Groups a blocking request stream into batches of whatever has already arrived
+    (at most max_size), so a batch never waits for requests the client has not sent.
+    When the consumer stops early (e.g. the client abandoned the stream and gRPC closes
+    the response generator), the reader thread stops instead of blocking on a full inbox.
+    """
+    inbox = queue.Queue(maxsize=max_size * 4)
+    done = object()
+    stopped = threading.Event()
+
+    def _put(item):
+        while not stopped.is_set():
+            try:
+                inbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read():
+        try:
+            for request in request_iterator:
+                if not _put(request):
+                    return
+        finally:
+            _put(done)
+
+    threading.Thread(target=_read, name="erp-stream-reader", daemon=True).start()
+    try:
+        while True:
+            request = inbox.get()
+            if request is done:
+                return
+            batch = [request]
+            while len(batch) < max_size:
+                try:
+                    request = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if request is done:
+                    yield batch
+                    return
+                batch.append(request)
+            yield batch
+    finally:
+        stopped.set()
+
+def build_publisher():
+    """StatusPublisher, behind the coalescing stage if ERP_STATUS_COALESCE_MS is set."""
+    publisher = StatusPublisher()
+    if COALESCE_WINDOW_MS > 0:
+        publisher = StatusCoalescer(publisher, COALESCE_WINDOW_MS)
+    return publisher
+
+def serve(address='[::]:50052', ledger=None, metrics_port=METRICS_PORT, publisher=None):
+    if publisher is None:
+        publisher = build_publisher()
+    publisher.start()
+    interaction_log = InteractionLogPublisher()
+    interaction_log.start()
+    service = OrderService(publisher, ledger, interaction_log=interaction_log)
+    executor = futures.ThreadPoolExecutor(max_workers=10)
+    server = grpc.server(executor, interceptors=[MetricsInterceptor()])
+    add_OrderServiceServicer_to_server(service, server)
+    metrics.register_gauge("erp_grpc_thread_pool_queue_depth",
+                           "RPCs waiting for a free worker thread", executor._work_queue.qsize)
+    metrics.register_gauge("erp_status_publisher_backlog",
+                           "Status update batches waiting for the publisher thread", publisher.backlog)
+    register_result_cache_metrics(service.results)
+    start_metrics_server(metrics_port)
+    server.add_insecure_port(address)
+    logging.info(f"gRPC server running on {address}")
     server.start()
     # Graceful shutdown on SIGTERM
     import signal
     def _sigterm_handler(signum, frame):
         logging.info("SIGTERM received, stopping gRPC server...")
         server.stop(0)
+        publisher.stop()
+        interaction_log.stop()
+        service.ledger.close()
     signal.signal(signal.SIGTERM, _sigterm_handler)
     server.wait_for_termination()
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    serve()
+    mode = os.getenv("ERP_SERVER_MODE", "sync")
+    if mode == "aio":
+        from aio_server import serve_aio
+        serve_aio()
+    elif mode == "sharded":
+        from sharding import serve_sharded
+        serve_sharded()
+    else:
+        serve()
@@ -0,0 +1,405 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+
+import grpc
+
+from server import serve, build_publisher, DEFAULT_STOCK, STREAM_BATCH_SIZE
+from aio_server import aiter_micro_batches, MAX_CONCURRENT_RPCS, SHUTDOWN_GRACE
+from metrics import AioMetricsInterceptor, start_metrics_server, METRICS_PORT
+from publisher import TRACE_METADATA_KEY
+from stock_ledger import StockLedger, DATA_DIR
+from google.protobuf.empty_pb2 import Empty
+from protos.order_pb2 import (
+    OrderRequest, OrderStatusUpdateRequest, OrderBatchRequest, OrderBatchResponse,
+    StockRequest, BatchStockRequest, BatchStockResponse, OrderResult
+)
+
+SHARD_COUNT = int(os.getenv("ERP_SHARDS", str(os.cpu_count() or 1)))
+SHARD_SOCKET_DIR = os.getenv("ERP_SHARD_SOCKET_DIR", "/tmp")
+# Timeout for forwarding a status update to the shard that owns the order
+STATUS_FORWARD_TIMEOUT = float(os.getenv("ERP_SHARD_FORWARD_TIMEOUT", "5"))
+# Seconds between liveness checks of the shard workers, and the max. delay before restarting one
+SUPERVISE_INTERVAL = 1.0
+MAX_RESTART_BACKOFF = 30.0
+SERVICE = "erp.OrderService"
+
+
+def shard_of(key, shards):
+    """
+    Product ids map to the shard holding their stock, order ids to the shard
+    publishing their status updates; crc32, stable across processes.
+    """
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def shard_address(index):
+    return f"unix:{os.path.join(SHARD_SOCKET_DIR, f'erp-shard-{index}.sock')}"
+
+
+class ShardStatusRouter:
+    """
+    Publisher of a shard worker. ProcessOrder runs on the shard owning the
+    product, UpdateOrderStatus on the shard owning the order. So that all
+    statuses of an order leave through one publisher (and one coalescer, whose
+    forward-only rule then holds), updates for orders owned by another shard
+    are forwarded to it with UpdateOrderStatus. Same interface as
+    publisher.StatusPublisher.
+
+    Forwarding never happens on a gRPC handler thread: handlers only enqueue,
+    and a forwarder thread sends the buffered updates concurrently and retries
+    failed ones with exponential backoff (e.g. while the owning shard is
+    restarted). Handler pools of different shards can therefore not block on
+    each other, and an order whose stock was already taken never fails
+    because its status could not be forwarded yet.
+    """
+    def __init__(self, publisher, index, shards, max_buffer: int = 10000, enqueue_timeout: float = 1.0,
+                 initial_backoff: float = 0.5, max_backoff: float = 30.0, max_forward_batch: int = 500):
+        self.publisher = publisher
+        self.index = index
+        self.shards = shards
+        self.enqueue_timeout = enqueue_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_forward_batch = max_forward_batch
+        self._buffer = queue.Queue(maxsize=max_buffer)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"erp-shard-{index}-forwarder", daemon=True)
+        self._channels = [grpc.insecure_channel(shard_address(i)) if i != index else None for i in range(shards)]
+        self._update_status = [
+            channel.unary_unary(f"/{SERVICE}/UpdateOrderStatus",
+                                request_serializer=OrderStatusUpdateRequest.SerializeToString,
+                                response_deserializer=Empty.FromString) if channel is not None else None
+            for channel in self._channels
+        ]
+
+    def start(self):
+        self.publisher.start()
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Forwards what can be forwarded within timeout, then stops the local publisher."""
+        self._stopping.set()
+        self._thread.join(timeout)
+        self.publisher.stop(timeout)
+        for channel in self._channels:
+            if channel is not None:
+                channel.close()
+
+    def backlog(self):
+        return self.publisher.backlog() + self._buffer.qsize()
+
+    def publish(self, order_id, status, trace_id=None):
+        self.publish_many([(order_id, status)], {order_id: trace_id} if trace_id else None)
+
+    def publish_many(self, updates, trace_ids=None):
+        trace_ids = trace_ids or {}
+        local, forwarded = [], []
+        for order_id, status in updates:
+            owner = shard_of(order_id, self.shards)
+            if owner == self.index:
+                local.append((order_id, status))
+            else:
+                forwarded.append((owner, order_id, status, trace_ids.get(order_id)))
+        if local:
+            self.publisher.publish_many(local, trace_ids)
+        if forwarded:
+            try:
+                self._buffer.put(forwarded, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # The caller's order is already applied; failing it now would not bring the update back
+                logging.error(f"Shard forward buffer full ({self._buffer.maxsize} batches), "
+                              f"dropping {len(forwarded)} status update(s) for other shards")
+
+    def _drain(self, first):
+        updates = list(first)
+        while len(updates) < self.max_forward_batch:
+            try:
+                updates.extend(self._buffer.get_nowait())
+            except queue.Empty:
+                break
+        return updates
+
+    def _forward(self, updates):
+        """Sends updates to their owning shards concurrently; returns the ones that failed."""
+        calls = [
+            (update, self._update_status[update[0]].future(
+                OrderStatusUpdateRequest(order_id=update[1], status=update[2]), timeout=STATUS_FORWARD_TIMEOUT,
+                metadata=((TRACE_METADATA_KEY, update[3]),) if update[3] else None))
+            for update in updates
+        ]
+        failed = []
+        for update, call in calls:
+            try:
+                call.result()
+            except grpc.RpcError as e:
+                failed.append(update)
+                error = e
+        if failed:
+            logging.warning(f"Forwarding {len(failed)} status update(s) to other shards failed "
+                            f"({error.code().name}: {error.details()})")
+        return failed
+
+    def _run(self):
+        # Updates that failed to forward are kept and sent again before newer batches
+        pending = []
+        backoff = self.initial_backoff
+        while not (self._stopping.is_set() and not pending and self._buffer.empty()):
+            if not pending:
+                try:
+                    pending = self._drain(self._buffer.get(timeout=1.0))
+                except queue.Empty:
+                    continue
+            pending = self._forward(pending)
+            if not pending:
+                backoff = self.initial_backoff
+                continue
+            if self._stopping.is_set():
+                break
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+        if pending or not self._buffer.empty():
+            logging.warning(f"Shard forwarder stopped with {len(pending)} update(s) and "
+                            f"{self._buffer.qsize()} queued batches not forwarded")
+
+
+def _run_shard(index, shards):
+    """Worker process: a complete sync ERP server owning the products and orders of one shard."""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s shard-{index} %(levelname)s %(message)s")
+    # Ctrl+C reaches the whole process group; the parent stops the workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    initial_stock = {
+        product_id: product for product_id, product in DEFAULT_STOCK.items()
+        if shard_of(product_id, shards) == index
+    }
+    ledger = StockLedger(os.path.join(DATA_DIR, f"shard-{index}"), initial_stock=initial_stock)
+    serve(address=shard_address(index), ledger=ledger, metrics_port=METRICS_PORT + 1 + index,
+          publisher=ShardStatusRouter(build_publisher(), index, shards))
+
+
+def _forward_metadata(context):
+    # Pass caller metadata (e.g. trace headers) on to the shard
+    return tuple((m.key, m.value) for m in context.invocation_metadata() or ()
+                 if not m.key.startswith(("grpc-", ":")) and m.key != "user-agent")
+
+
+class ShardDispatcher:
+    """
+    Front gRPC endpoint of the sharded mode. Single-product RPCs are forwarded
+    as raw bytes to the worker that owns the product, UpdateOrderStatus to the
+    worker that owns the order; batch RPCs are split per shard, sent
+    concurrently and merged back in request order. Each shard keeps
+    single-writer semantics for its products, while the shards together use
+    all cores.
+    """
+    def __init__(self, addresses):
+        self.shards = len(addresses)
+        self.channels = [grpc.aio.insecure_channel(address) for address in addresses]
+
+        def raw(method):
+            # No (de)serializers: bytes in, bytes out
+            return [channel.unary_unary(f"/{SERVICE}/{method}") for channel in self.channels]
+
+        self._process_order = raw("ProcessOrder")
+        self._update_status = raw("UpdateOrderStatus")
+        self._get_stock = raw("GetStock")
+        self._process_batch = [
+            channel.unary_unary(f"/{SERVICE}/ProcessOrderBatch",
+                                request_serializer=OrderBatchRequest.SerializeToString,
+                                response_deserializer=OrderBatchResponse.FromString)
+            for channel in self.channels
+        ]
+        self._batch_get_stock = [
+            channel.unary_unary(f"/{SERVICE}/BatchGetStock",
+                                request_serializer=BatchStockRequest.SerializeToString,
+                                response_deserializer=BatchStockResponse.FromString)
+            for channel in self.channels
+        ]
+
+    async def wait_ready(self, timeout: float = 30.0):
+        await asyncio.wait_for(asyncio.gather(*(ch.channel_ready() for ch in self.channels)), timeout)
+
+    async def close(self):
+        await asyncio.gather(*(ch.close() for ch in self.channels))
+
+    async def _forward(self, stubs, shard, raw_request, context):
+        try:
+            return await stubs[shard](raw_request, timeout=context.time_remaining(),
+                                      metadata=_forward_metadata(context))
+        except grpc.aio.AioRpcError as e:
+            await context.abort(e.code(), e.details())
+
+    async def ProcessOrder(self, raw_request, context):
+        request = OrderRequest.FromString(raw_request)
+        return await self._forward(self._process_order, shard_of(request.product_id, self.shards),
+                                   raw_request, context)
+
+    async def UpdateOrderStatus(self, raw_request, context):
+        request = OrderStatusUpdateRequest.FromString(raw_request)
+        return await self._forward(self._update_status, shard_of(request.order_id, self.shards),
+                                   raw_request, context)
+
+    async def GetStock(self, raw_request, context):
+        request = StockRequest.FromString(raw_request)
+        return await self._forward(self._get_stock, shard_of(request.product_id, self.shards),
+                                   raw_request, context)
+
+    async def _process_orders(self, orders, context):
+        by_shard = {}
+        for i, order in enumerate(orders):
+            by_shard.setdefault(shard_of(order.product_id, self.shards), []).append(i)
+        shard_ids = list(by_shard)
+        replies = await asyncio.gather(*(
+            self._process_batch[shard](OrderBatchRequest(orders=[orders[i] for i in by_shard[shard]]),
+                                       timeout=context.time_remaining(), metadata=_forward_metadata(context))
+            for shard in shard_ids
+        ), return_exceptions=True)
+        results = [None] * len(orders)
+        for shard, reply in zip(shard_ids, replies):
+            if isinstance(reply, Exception):
+                # A failing shard fails only its own orders
+                code = reply.code() if isinstance(reply, grpc.aio.AioRpcError) else grpc.StatusCode.UNAVAILABLE
+                for i in by_shard[shard]:
+                    results[i] = OrderResult(order_id=orders[i].order_id, code=code.value[0], details=str(reply))
+                continue
+            for i, result in zip(by_shard[shard], reply.results):
+                results[i] = result
+        return results
+
+    async def ProcessOrderBatch(self, request, context):
+        return OrderBatchResponse(results=await self._process_orders(list(request.orders), context))
+
+    async def ProcessOrders(self, request_iterator, context):
+        async for batch in aiter_micro_batches(request_iterator, STREAM_BATCH_SIZE):
+            for result in await self._process_orders(batch, context):
+                yield result
+
+    async def BatchGetStock(self, request, context):
+        product_ids = list(request.product_ids)
+        by_shard = {}
+        for i, product_id in enumerate(product_ids):
+            by_shard.setdefault(shard_of(product_id, self.shards), []).append(i)
+        shard_ids = list(by_shard)
+        try:
+            replies = await asyncio.gather(*(
+                self._batch_get_stock[shard](BatchStockRequest(product_ids=[product_ids[i] for i in by_shard[shard]]),
+                                             timeout=context.time_remaining())
+                for shard in shard_ids
+            ))
+        except grpc.aio.AioRpcError as e:
+            await context.abort(e.code(), e.details())
+        items = [None] * len(product_ids)
+        for shard, reply in zip(shard_ids, replies):
+            for i, item in zip(by_shard[shard], reply.items):
+                items[i] = item
+        return BatchStockResponse(items=items)
+
+    def generic_handler(self):
+        identity = None
+        return grpc.method_handlers_generic_handler(SERVICE, {
+            "ProcessOrder": grpc.unary_unary_rpc_method_handler(
+                self.ProcessOrder, request_deserializer=identity, response_serializer=identity),
+            "UpdateOrderStatus": grpc.unary_unary_rpc_method_handler(
+                self.UpdateOrderStatus, request_deserializer=identity, response_serializer=identity),
+            "GetStock": grpc.unary_unary_rpc_method_handler(
+                self.GetStock, request_deserializer=identity, response_serializer=identity),
+            "ProcessOrderBatch": grpc.unary_unary_rpc_method_handler(
+                self.ProcessOrderBatch,
+                request_deserializer=OrderBatchRequest.FromString,
+                response_serializer=OrderBatchResponse.SerializeToString),
+            "ProcessOrders": grpc.stream_stream_rpc_method_handler(
+                self.ProcessOrders,
+                request_deserializer=OrderRequest.FromString,
+                response_serializer=OrderResult.SerializeToString),
+            "BatchGetStock": grpc.unary_unary_rpc_method_handler(
+                self.BatchGetStock,
+                request_deserializer=BatchStockRequest.FromString,
+                response_serializer=BatchStockResponse.SerializeToString),
+        })
+
+
+async def _supervise(workers, start_worker):
+    """
+    Restarts shard workers that exited. A worker that dies again shortly
+    after its start is restarted with exponential backoff.
+    """
+    started = [time.monotonic()] * len(workers)
+    failures = [0] * len(workers)
+    restart_at = [None] * len(workers)
+    while True:
+        await asyncio.sleep(SUPERVISE_INTERVAL)
+        now = time.monotonic()
+        for index, worker in enumerate(workers):
+            if worker.is_alive():
+                continue
+            if restart_at[index] is None:
+                failures[index] = failures[index] + 1 if now - started[index] < MAX_RESTART_BACKOFF else 0
+                delay = min(2 ** failures[index] - 1, MAX_RESTART_BACKOFF)
+                logging.error(f"ERP shard {index} exited with code {worker.exitcode}, restarting in {delay:.0f}s")
+                restart_at[index] = now + delay
+            if now >= restart_at[index]:
+                workers[index] = start_worker(index)
+                started[index] = now
+                restart_at[index] = None
+
+
+async def _serve_dispatcher(addresses, address, shutdown_grace, workers=None, start_worker=None):
+    dispatcher = ShardDispatcher(addresses)
+    await dispatcher.wait_ready()
+    server = grpc.aio.server(maximum_concurrent_rpcs=MAX_CONCURRENT_RPCS,
+                             interceptors=[AioMetricsInterceptor()])
+    server.add_generic_rpc_handlers((dispatcher.generic_handler(),))
+    server.add_insecure_port(address)
+    start_metrics_server()
+    await server.start()
+    logging.info(f"gRPC shard dispatcher running on {address} ({len(addresses)} shards)")
+    supervisor = asyncio.create_task(_supervise(workers, start_worker)) if workers is not None else None
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    await stop_event.wait()
+    if supervisor is not None:
+        supervisor.cancel()
+    logging.info(f"Shutdown requested, draining dispatcher for up to {shutdown_grace}s...")
+    await server.stop(shutdown_grace)
+    await dispatcher.close()
+
+
+def serve_sharded(shards: int = SHARD_COUNT, address='[::]:50052', shutdown_grace: float = SHUTDOWN_GRACE):
+    """
+    Starts one worker process per shard on a Unix socket and serves the
+    dispatcher on address. Products are owned by shard crc32(product_id) % shards,
+    so the shard count must stay the same across restarts of a data directory.
+    Workers that die are restarted by the dispatcher process.
+    """
+    context = multiprocessing.get_context("spawn")
+
+    def start_worker(index):
+        worker = context.Process(target=_run_shard, args=(index, shards), name=f"erp-shard-{index}")
+        worker.start()
+        return worker
+
+    workers = [start_worker(index) for index in range(shards)]
+    try:
+        asyncio.run(_serve_dispatcher([shard_address(i) for i in range(shards)], address, shutdown_grace,
+                                      workers, start_worker))
+    finally:
+        # SIGTERM lets each worker stop its server, flush its publisher and snapshot its ledger
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join(shutdown_grace)
+        logging.info("All ERP shards stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve_sharded()
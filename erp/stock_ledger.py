@@ -0,0 +1,356 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import zlib
+from types import MappingProxyType
+
+DATA_DIR = os.getenv("ERP_DATA_DIR", "data")
+# Seconds between snapshots; a snapshot is only written if the journal grew
+SNAPSHOT_INTERVAL = float(os.getenv("ERP_SNAPSHOT_INTERVAL", "30"))
+
+
+class UnknownProduct(Exception):
+    """Raised when a product id is not in the ledger."""
+
+
+class InsufficientStock(Exception):
+    """Raised when a decrement would take the stock below zero."""
+
+
+class StockLedger:
+    """
+    Concurrency-safe, persistent stock table for the ERP.
+
+    Every product hashes to one of `stripes` locks, so the check-then-decrement
+    of one order never blocks orders for products on other stripes. A change
+    is applied in memory under its stripe lock and handed to a journal thread
+    with a sequence number; the caller releases the stripe and then waits until
+    its sequence is written (group commit: one write, flush and optional fsync
+    for all changes that queued up meanwhile). Sequence order is per-product
+    commit order, so replaying the journal of absolute stock values restores
+    the latest state. A background thread periodically writes a snapshot and
+    starts a fresh journal. On startup the snapshot is loaded and the journal
+    replayed on top of it (a torn last line from a crash is ignored).
+
+    Readers never take a lock: the journal thread publishes an immutable
+    copy-on-write view of the table ({product_id: (name, stock)}) for the
+    changes it has written, and reads only dereference the current view. A
+    change is therefore visible once it is durable, and before its caller
+    returns.
+
+    The *_async variants do the same without blocking the event loop: the
+    journal thread resolves an asyncio future once the change is written, so
+    concurrent orders on one grpc.aio loop share a group commit.
+    """
+    SNAPSHOT_FILE = "stock_snapshot.json"
+    JOURNAL_FILE = "stock_journal.jsonl"
+
+    def __init__(self, data_dir: str = DATA_DIR, initial_stock=None, stripes: int = 64,
+                 snapshot_interval: float = SNAPSHOT_INTERVAL, fsync: bool = False):
+        self.data_dir = data_dir
+        self.snapshot_path = os.path.join(data_dir, self.SNAPSHOT_FILE)
+        self.journal_path = os.path.join(data_dir, self.JOURNAL_FILE)
+        self.fsync = fsync
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        # Serializes journal writes and view publishes with the snapshot/rotation of the journal
+        self._journal_lock = threading.Lock()
+        self._journal_entries = 0
+        self._products = {}
+        self._view = MappingProxyType({})
+        self._journal = None
+        # Changes waiting for the journal thread, and the last queued / written sequence number
+        self._queue_cond = threading.Condition()
+        self._queued = []
+        self._queued_seq = 0
+        self._written_cond = threading.Condition()
+        self._written_seq = 0
+        # (seq, tiebreak, loop, future) of async callers, ordered by seq; guarded by _written_cond
+        self._written_futures = []
+        self._future_ids = itertools.count()
+        self._journal_error = None
+
+        os.makedirs(data_dir, exist_ok=True)
+        if not self._load() and initial_stock:
+            for product_id, product in initial_stock.items():
+                self._products[product_id] = {"name": product["name"], "stock": product["stock"]}
+        self._view = MappingProxyType({
+            product_id: (product["name"], product["stock"]) for product_id, product in self._products.items()
+        })
+        # Compact right away, so new records never get appended behind a torn tail
+        self.snapshot()
+
+        self._stopping = threading.Event()
+        self._journal_thread = threading.Thread(target=self._journal_loop, name="erp-stock-journal", daemon=True)
+        self._journal_thread.start()
+        self._snapshot_thread = None
+        if snapshot_interval > 0:
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, args=(snapshot_interval,),
+                name="erp-stock-snapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+
+    def _stripe(self, product_id):
+        return self._stripes[zlib.crc32(product_id.encode("utf-8")) % len(self._stripes)]
+
+    def get(self, product_id):
+        """Returns the current stock of a product, or None if it is unknown."""
+        entry = self._view.get(product_id)
+        return entry[1] if entry else None
+
+    def view(self):
+        """Returns the current immutable {product_id: (name, stock)} view; never blocks on writers."""
+        return self._view
+
+    def products(self):
+        """Returns a copy of all products as {product_id: {"name", "stock"}}."""
+        return {product_id: {"name": name, "stock": stock} for product_id, (name, stock) in self._view.items()}
+
+    def try_decrement(self, product_id, quantity):
+        """
+        Atomically checks and decrements the stock of a product.
+        Returns the remaining stock; raises UnknownProduct or InsufficientStock.
+        """
+        new_stock, seq = self._decrement(product_id, quantity)
+        self._wait_written(seq)
+        return new_stock
+
+    async def try_decrement_async(self, product_id, quantity):
+        """try_decrement for event loops: awaits the journal write instead of blocking on it."""
+        new_stock, seq = self._decrement(product_id, quantity)
+        await self._written(seq)
+        return new_stock
+
+    def _decrement(self, product_id, quantity):
+        with self._stripe(product_id):
+            product = self._products.get(product_id)
+            if product is None:
+                raise UnknownProduct(product_id)
+            if product["stock"] < quantity:
+                raise InsufficientStock(product_id)
+            new_stock = product["stock"] - quantity
+            return new_stock, self._commit(product_id, {"stock": new_stock})
+
+    def try_decrement_batch(self, items):
+        """
+        Applies a batch of (product_id, quantity) decrements in order under one
+        acquisition of the involved stripes and one journal write.
+        Returns one entry per item: the remaining stock, or the UnknownProduct /
+        InsufficientStock exception for items that were rejected.
+        """
+        outcomes, seq = self._decrement_batch(items)
+        if seq is not None:
+            self._wait_written(seq)
+        return outcomes
+
+    async def try_decrement_batch_async(self, items):
+        """try_decrement_batch for event loops: awaits the journal write instead of blocking on it."""
+        outcomes, seq = self._decrement_batch(items)
+        if seq is not None:
+            await self._written(seq)
+        return outcomes
+
+    def _decrement_batch(self, items):
+        stripe_ids = sorted({zlib.crc32(product_id.encode("utf-8")) % len(self._stripes) for product_id, _ in items})
+        # Stripes are always taken in index order, so concurrent batches cannot deadlock
+        for stripe_id in stripe_ids:
+            self._stripes[stripe_id].acquire()
+        try:
+            working = {}
+            outcomes = []
+            for product_id, quantity in items:
+                product = self._products.get(product_id)
+                if product is None:
+                    outcomes.append(UnknownProduct(product_id))
+                    continue
+                stock = working.get(product_id, product["stock"])
+                if stock < quantity:
+                    outcomes.append(InsufficientStock(product_id))
+                    continue
+                working[product_id] = stock - quantity
+                outcomes.append(stock - quantity)
+            seq = self._commit_many([(product_id, {"stock": stock}) for product_id, stock in working.items()]) \
+                if working else None
+        finally:
+            for stripe_id in reversed(stripe_ids):
+                self._stripes[stripe_id].release()
+        return outcomes, seq
+
+    def adjust(self, product_id, delta, name=None):
+        """Adds delta to a product's stock (negative to remove), creating the product if needed."""
+        with self._stripe(product_id):
+            product = self._products.get(product_id)
+            if product is None:
+                if name is None:
+                    raise UnknownProduct(product_id)
+                change = {"name": name, "stock": delta}
+            else:
+                change = {"stock": product["stock"] + delta}
+            if change["stock"] < 0:
+                raise InsufficientStock(product_id)
+            seq = self._commit(product_id, change)
+        self._wait_written(seq)
+        return change["stock"]
+
+    def _commit(self, product_id, change):
+        return self._commit_many([(product_id, change)])
+
+    def _commit_many(self, changes):
+        """
+        Applies changes in memory and queues them for the journal thread.
+        Caller holds the products' stripe locks, so queue order matches commit
+        order per product. Returns the sequence number to pass to _wait_written.
+        """
+        if self._journal_error is not None:
+            raise self._journal_error
+        for product_id, change in changes:
+            self._apply(product_id, change)
+        with self._queue_cond:
+            self._queued_seq += 1
+            self._queued.append(changes)
+            self._queue_cond.notify()
+            return self._queued_seq
+
+    def _wait_written(self, seq):
+        """Blocks until the journal thread has written (and published) everything up to seq."""
+        with self._written_cond:
+            while self._written_seq < seq and self._journal_error is None:
+                self._written_cond.wait()
+        if self._journal_error is not None:
+            raise self._journal_error
+
+    def _written(self, seq):
+        """Future for the running event loop that resolves once everything up to seq is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._written_cond:
+            if self._written_seq < seq and self._journal_error is None:
+                heapq.heappush(self._written_futures, (seq, next(self._future_ids), loop, future))
+                return future
+        _settle(future, self._journal_error)
+        return future
+
+    def _journal_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queued and not self._stopping.is_set():
+                    self._queue_cond.wait()
+                if not self._queued:
+                    return
+                batch, self._queued = self._queued, []
+                seq = self._queued_seq
+            try:
+                self._write_journal(batch)
+            except OSError as e:
+                # In-memory state is already ahead of the journal: fail every later commit
+                logging.error(f"Stock journal write failed, ledger is now read-only: {e}")
+                self._journal_error = e
+            with self._written_cond:
+                self._written_seq = seq
+                self._written_cond.notify_all()
+                ready = []
+                while self._written_futures and (self._written_futures[0][0] <= seq or self._journal_error):
+                    ready.append(heapq.heappop(self._written_futures))
+            for _, _, loop, future in ready:
+                try:
+                    loop.call_soon_threadsafe(_settle, future, self._journal_error)
+                except RuntimeError:
+                    pass  # the waiting loop is already closed
+
+    def _write_journal(self, batch):
+        # Write and publish under the journal lock, so a snapshot of the view always
+        # matches exactly what the journal it truncates holds
+        records = "".join(json.dumps({"product_id": product_id, **change}) + "\n"
+                          for changes in batch for product_id, change in changes)
+        with self._journal_lock:
+            self._journal.write(records)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            # One copy of the view per journal batch, not per change
+            view = dict(self._view)
+            for changes in batch:
+                self._journal_entries += len(changes)
+                for product_id, change in changes:
+                    view[product_id] = (change.get("name") or view.get(product_id, (product_id,))[0],
+                                        change["stock"])
+            self._view = MappingProxyType(view)
+
+    def _apply(self, product_id, change):
+        product = self._products.get(product_id)
+        if product is None:
+            self._products[product_id] = {"name": change.get("name", product_id), "stock": change["stock"]}
+        else:
+            product["stock"] = change["stock"]
+
+    def _load(self):
+        """Loads the snapshot and replays the journal. Returns False if there was nothing on disk."""
+        found = False
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                self._products = json.load(f)["products"]
+            found = True
+        if os.path.exists(self.journal_path):
+            replayed = 0
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logging.warning("Ignoring torn record at the end of the stock journal")
+                        break
+                    self._apply(record.pop("product_id"), record)
+                    replayed += 1
+            self._journal_entries = replayed
+            found = found or replayed > 0
+            logging.info(f"Stock ledger replayed {replayed} journal records")
+        return found
+
+    def snapshot(self):
+        """Writes a snapshot of the published (journaled) view atomically and truncates the journal."""
+        with self._journal_lock:
+            data = json.dumps({"products": {
+                product_id: {"name": name, "stock": stock} for product_id, (name, stock) in self._view.items()
+            }})
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = open(self.journal_path, "w", encoding="utf-8")
+            self._journal_entries = 0
+
+    def _snapshot_loop(self, interval):
+        while not self._stopping.wait(interval):
+            if self._journal_entries:
+                try:
+                    self.snapshot()
+                except OSError as e:
+                    logging.error(f"Stock snapshot failed: {e}")
+
+    def close(self):
+        self._stopping.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        # The journal thread drains queued changes before it exits
+        with self._queue_cond:
+            self._queue_cond.notify()
+        self._journal_thread.join()
+        self.snapshot()
+        self._journal.close()
+
+
+def _settle(future, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(None)
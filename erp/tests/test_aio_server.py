@@ -0,0 +1,51 @@
+import asyncio
+
+from aio_server import aiter_micro_batches
+
+
+def test_cancelling_stream_mid_batch_stops_reader():
+    async def scenario():
+        async def requests():
+            for index in range(100):
+                yield index
+            await asyncio.Event().wait()  # the client keeps the stream open
+
+        batches = aiter_micro_batches(requests(), 2)
+        received = []
+
+        async def handler():
+            async for batch in batches:
+                received.append(batch)
+                await asyncio.sleep(10)  # still processing when the RPC is cancelled
+
+        task = asyncio.create_task(handler())
+        while not received:
+            await asyncio.sleep(0)
+        # The reader has filled the inbox and waits for room
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.wait_for(batches.aclose(), 1)
+
+        assert received == [[0, 1]]
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        assert pending == []
+
+    asyncio.run(scenario())
+
+
+def test_stream_end_with_full_inbox_yields_everything():
+    async def scenario():
+        async def requests():
+            for index in range(20):
+                yield index
+
+        batches = []
+        async for batch in aiter_micro_batches(requests(), 2):
+            batches.append(batch)
+            await asyncio.sleep(0.001)
+        return batches
+
+    batches = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert [request for batch in batches for request in batch] == list(range(20))
+    assert all(len(batch) <= 2 for batch in batches)
@@ -0,0 +1,49 @@
+import asyncio
+
+from coalescer import AsyncStatusCoalescer
+
+
+class SlowPublisher:
+    def __init__(self, delay):
+        self.delay = delay
+        self.published = []
+        self.flushing = asyncio.Event()
+        self.closed = False
+
+    async def publish_many(self, updates, trace_ids=None):
+        self.flushing.set()
+        await asyncio.sleep(self.delay)
+        self.published.extend(updates)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_close_waits_for_in_flight_flush_and_flushes_the_rest():
+    async def scenario():
+        publisher = SlowPublisher(0.05)
+        coalescer = AsyncStatusCoalescer(publisher, window_ms=1)
+        await coalescer.publish_many([(1, 1), (2, 1)])
+        await publisher.flushing.wait()
+        # Arrives while the first batch is being published
+        await coalescer.publish_many([(3, 2)])
+        await coalescer.close()
+        return publisher
+
+    publisher = asyncio.run(scenario())
+    assert sorted(publisher.published) == [(1, 1), (2, 1), (3, 2)]
+    assert publisher.closed
+
+
+def test_close_after_timeout_requeues_the_cancelled_flush():
+    async def scenario():
+        publisher = SlowPublisher(10)
+        coalescer = AsyncStatusCoalescer(publisher, window_ms=1)
+        await coalescer.publish_many([(1, 1)])
+        await publisher.flushing.wait()
+        publisher.delay = 0
+        await coalescer.close(timeout=0.01)
+        return publisher
+
+    publisher = asyncio.run(scenario())
+    assert publisher.published == [(1, 1)]
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Query, HTTPException, Body
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Query, HTTPException, Body, Response, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+import os
 import json
+import zlib
+import orjson
 
-from .logger import async_logger
-from .models import LogEntry, LogRequest
+from .logger import async_logger, build_log_entry, client_timestamp
+from .broadcast import LOG_STREAM_MAX_LAG
+from .models import LogEntry, LogRequest, LogBatchItem
+from .traces import build_trace_timeline, TRACE_MAX_ENTRIES
+
+# Grenzen für POST /logs/batch (Einträge pro Anfrage, Bytes nach dem Entpacken)
+LOG_BATCH_MAX_ENTRIES = int(os.getenv("LOG_BATCH_MAX_ENTRIES", "10000"))
+LOG_BATCH_MAX_BYTES = int(os.getenv("LOG_BATCH_MAX_BYTES", str(32 * 1024 * 1024)))
 
 router = APIRouter(prefix="/logs", tags=["logs"])
+traces_router = APIRouter(prefix="/traces", tags=["traces"])
 
 # Import der App aus main.py (damit app.api:app verfügbar ist)
 import importlib
@@ -18,6 +30,7 @@ except (ImportError, AttributeError):
     from fastapi import FastAPI
     app = FastAPI()
     app.include_router(router)
+    app.include_router(traces_router)
 
 @router.post("/", status_code=201, response_model=Dict[str, str])
 async def create_log_entry(log_request: LogRequest):
@@ -34,67 +47,309 @@ async def create_log_entry(log_request: LogRequest):
             interaction_type=log_request.interaction_type,
             message=log_request.message,
             status=log_request.status,
-            error_message=log_request.error_message
+            error_message=log_request.error_message,
+            trace_id=log_request.trace_id,
+            duration_ms=log_request.duration_ms
         )
         return {"status": "success", "message": "Log-Eintrag erfolgreich erstellt"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fehler beim Erstellen des Log-Eintrags: {str(e)}")
 
+@router.post("/batch", response_model=Dict[str, Any])
+async def create_log_entries(
+    request: Request,
+    content_type: Optional[str] = Header(None),
+    content_encoding: Optional[str] = Header(None)
+):
+    """
+    Erstellt viele Log-Einträge mit einer Anfrage, z.B. wenn ein Client nach
+    einem RabbitMQ-Ausfall seinen Puffer leert. Der Body ist ein JSON-Array
+    von LogRequest-Objekten oder NDJSON (eine Zeile pro Eintrag, Content-Type
+    application/x-ndjson), optional mit Content-Encoding: gzip. Ein Eintrag
+    darf seinen ursprünglichen 'timestamp' mitbringen.
+
+    Gültige Einträge werden gemeinsam geschrieben; die Antwort meldet pro
+    Eintrag (in Reihenfolge des Bodys), ob er geschrieben ('accepted'),
+    abgelehnt ('rejected') oder wegen eines Schreibfehlers nicht gespeichert
+    wurde ('failed', erneut senden), mit dem Grund.
+    """
+    gzipped = bool(content_encoding) and content_encoding.strip().lower() == "gzip"
+    try:
+        body = await _read_body(request, gzipped, LOG_BATCH_MAX_BYTES)
+        items = _parse_batch(body, content_type or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items) > LOG_BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Mehr als {LOG_BATCH_MAX_ENTRIES} Einträge pro Anfrage")
+
+    results = []
+    entries = []
+    for index, (item, error) in enumerate(items):
+        if error is None:
+            try:
+                if isinstance(item, dict) and "message" not in item and "payload" in item:
+                    # Envelope des Log-Clients (Nachricht unter 'payload')
+                    item = dict(item, message=item["payload"])
+                log_request = LogBatchItem.model_validate(item)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'entry'}: {err['msg']}"
+                                  for err in e.errors())
+        timestamp = None
+        if error is None and log_request.timestamp is not None:
+            try:
+                timestamp = client_timestamp(log_request.timestamp)
+            except ValueError as e:
+                error = f"timestamp: {e}"
+        if error is not None:
+            results.append({"index": index, "status": "rejected", "error": error})
+            continue
+        entries.append(build_log_entry(
+            source_system=log_request.source_system,
+            target_system=log_request.target_system,
+            interaction_type=log_request.interaction_type,
+            message=log_request.message,
+            status=log_request.status,
+            error_message=log_request.error_message,
+            trace_id=log_request.trace_id,
+            duration_ms=log_request.duration_ms,
+            timestamp=timestamp
+        ))
+        results.append({"index": index, "status": "accepted"})
+
+    try:
+        outcomes = await async_logger.log_many(entries, return_exceptions=True)
+    except Exception as e:
+        # Writer nicht erreichbar: keiner der Einträge ist sicher gespeichert
+        outcomes = [e] * len(entries)
+    accepted = iter(result for result in results if result["status"] == "accepted")
+    failed = 0
+    for result, outcome in zip(accepted, outcomes):
+        if outcome is not None:
+            result["status"] = "failed"
+            result["error"] = f"Fehler beim Schreiben: {outcome}"
+            failed += 1
+    return {
+        "accepted": len(entries) - failed,
+        "rejected": len(results) - len(entries),
+        "failed": failed,
+        "results": results,
+    }
+
+async def _read_body(request: Request, gzipped: bool, max_bytes: int) -> bytes:
+    """
+    Liest den Body stückweise und bricht mit 413 ab, sobald er (entpackt)
+    max_bytes überschreitet, statt ihn vorher vollständig zu puffern.
+    """
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS) if gzipped else None
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        if decompressor is not None:
+            try:
+                # Nur so viel entpacken, wie noch erlaubt ist (+1, um die Überschreitung zu erkennen)
+                chunk = decompressor.decompress(chunk, max_bytes - size + 1)
+            except zlib.error as e:
+                raise ValueError(f"Ungültige gzip-Daten: {e}")
+            if decompressor.unused_data:
+                raise ValueError("Daten nach dem Ende der gzip-Daten")
+            if decompressor.unconsumed_tail:
+                size = max_bytes + 1
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Body größer als {max_bytes} Bytes")
+        chunks.append(chunk)
+    if decompressor is not None and not decompressor.eof:
+        raise ValueError("Unvollständige gzip-Daten")
+    return b"".join(chunks)
+
+def _parse_batch(body: bytes, content_type: str) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Liefert (Objekt, Fehler) pro Eintrag. Ein JSON-Array muss als Ganzes
+    gültig sein; bei NDJSON wird jede nicht-leere Zeile einzeln gelesen, eine
+    kaputte Zeile lehnt nur ihren Eintrag ab.
+    """
+    stripped = body.lstrip()
+    if "ndjson" not in content_type and "jsonl" not in content_type and stripped.startswith(b"["):
+        try:
+            items = orjson.loads(stripped)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Ungültiges JSON: {e}")
+        if not isinstance(items, list):
+            raise ValueError("Erwartet wird ein JSON-Array")
+        return [(item, None) for item in items]
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append((orjson.loads(line), None))
+        except orjson.JSONDecodeError as e:
+            items.append((None, f"Ungültiges JSON: {e}"))
+    return items
+
 @router.get("/", response_model=List[LogEntry])
 async def get_logs(
-    limit: int = Query(100, description="Maximale Anzahl der zurückzugebenden Logs"),
+    response: Response,
+    limit: int = Query(100, ge=1, le=10000, description="Maximale Anzahl der zurückzugebenden Logs"),
     source_system: Optional[str] = Query(None, description="Filter für Quellsystem"),
     target_system: Optional[str] = Query(None, description="Filter für Zielsystem"),
-    interaction_type: Optional[str] = Query(None, description="Filter für Interaktionstyp")
+    interaction_type: Optional[str] = Query(None, description="Filter für Interaktionstyp"),
+    status: Optional[str] = Query(None, description="Filter für Status"),
+    since: Optional[datetime] = Query(None, description="Nur Logs ab diesem Zeitpunkt (inklusive)"),
+    until: Optional[datetime] = Query(None, description="Nur Logs vor diesem Zeitpunkt"),
+    cursor: Optional[str] = Query(None, description="Cursor aus X-Next-Cursor der vorherigen Seite")
 ):
     """
-    Ruft die Logs aus dem System ab mit optionalen Filtern.
+    Ruft die Logs aus dem System ab mit optionalen Filtern, neueste zuerst.
+    Gibt es ältere Treffer, steht der Cursor der nächsten Seite im Header X-Next-Cursor.
     """
     try:
-        logs = await async_logger.get_logs(
+        logs, next_cursor = await async_logger.query_logs(
             limit=limit,
             filter_source=source_system,
             filter_target=target_system,
-            filter_type=interaction_type
+            filter_type=interaction_type,
+            filter_status=status,
+            since=since,
+            until=until,
+            cursor=cursor
         )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
         return logs
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen der Logs: {str(e)}")
 
+@router.get("/search", response_model=List[LogEntry])
+async def search_logs(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Suchbegriffe; alle müssen in der Nachricht vorkommen"),
+    limit: int = Query(100, ge=1, le=10000, description="Maximale Anzahl der zurückzugebenden Logs"),
+    source_system: Optional[str] = Query(None, description="Filter für Quellsystem"),
+    target_system: Optional[str] = Query(None, description="Filter für Zielsystem"),
+    interaction_type: Optional[str] = Query(None, description="Filter für Interaktionstyp"),
+    status: Optional[str] = Query(None, description="Filter für Status"),
+    since: Optional[datetime] = Query(None, description="Nur Logs ab diesem Zeitpunkt (inklusive)"),
+    until: Optional[datetime] = Query(None, description="Nur Logs vor diesem Zeitpunkt"),
+    cursor: Optional[str] = Query(None, description="Cursor aus X-Next-Cursor der vorherigen Seite")
+):
+    """
+    Volltextsuche über Schlüssel und Werte der geloggten Nachrichten (z.B.
+    Bestellnummer oder E-Mail-Adresse), neueste Treffer zuerst. Filter und
+    Paginierung wie bei GET /logs.
+    """
+    try:
+        logs, next_cursor = await async_logger.search_logs(
+            q,
+            limit=limit,
+            filter_source=source_system,
+            filter_target=target_system,
+            filter_type=interaction_type,
+            filter_status=status,
+            since=since,
+            until=until,
+            cursor=cursor
+        )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return logs
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fehler bei der Suche in den Logs: {str(e)}")
+
+@router.get("/stream")
+async def stream_logs(
+    source_system: Optional[str] = Query(None, description="Filter für Quellsystem"),
+    target_system: Optional[str] = Query(None, description="Filter für Zielsystem"),
+    interaction_type: Optional[str] = Query(None, description="Filter für Interaktionstyp"),
+    status: Optional[str] = Query(None, description="Filter für Status"),
+    max_lag: int = Query(LOG_STREAM_MAX_LAG, ge=1, description="Max. Rückstand in Einträgen, bevor übersprungen wird"),
+    lag_policy: str = Query("skip", pattern="^(skip|close)$", description="'skip': älteste überspringen, 'close': Verbindung beenden"),
+    last_event_id: Optional[int] = Header(None, description="Fortsetzen hinter dieser Ereignis-ID")
+):
+    """
+    Live-Tail der Logs als Server-Sent Events mit denselben Filtern wie GET /logs.
+    Jeder neue Eintrag kommt als 'data:'-Zeile mit seiner Sequenznummer als 'id:'.
+    Kommt ein Client nicht hinterher, wird ein 'lag'-Ereignis mit der Anzahl
+    übersprungener Einträge gesendet (bzw. bei lag_policy=close die Verbindung beendet).
+    """
+    filters = {
+        "source_system": source_system,
+        "target_system": target_system,
+        "interaction_type": interaction_type,
+        "status": status,
+    }
+    await async_logger.start()
+
+    async def events():
+        async for kind, seq, value in async_logger.broadcaster.subscribe(filters, max_lag, after=last_event_id):
+            if kind == "entry":
+                yield f"id: {seq}\ndata: {value}\n\n"
+            elif kind == "lag":
+                yield f"id: {seq}\nevent: lag\ndata: {json.dumps({'dropped': value})}\n\n"
+                if lag_policy == "close":
+                    return
+            else:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/stats", response_model=Dict[str, Any])
-async def get_log_statistics():
+async def get_log_statistics(
+    since: Optional[datetime] = Query(None, description="Beginn des Zeitraums (inklusive)"),
+    until: Optional[datetime] = Query(None, description="Ende des Zeitraums"),
+    resolution: Optional[str] = Query(None, description="Zeitreihe in 'minute' oder 'hour' Buckets")
+):
     """
-    Gibt einfache Statistiken über die protokollierten Interaktionen zurück.
+    Gibt Statistiken über die protokollierten Interaktionen zurück.
+    Ohne Zeitraum exakte Gesamtsummen, mit since/until/resolution zusätzlich
+    eine Zeitreihe ('series') über Minuten- bzw. Stunden-Buckets.
     """
     try:
-        # Alle Logs abrufen (mit höherem Limit für Statistik)
-        logs = await async_logger.get_logs(limit=10000)
-        
-        # Statistik berechnen
-        stats = {
-            "total_interactions": len(logs),
-            "by_source": {},
-            "by_target": {},
-            "by_type": {},
-            "by_status": {},
-            "latest_timestamp": logs[0]["timestamp"] if logs else None
-        }
-        
-        for log in logs:
-            source = log.get("source_system", "unknown")
-            target = log.get("target_system", "unknown")
-            interaction_type = log.get("interaction_type", "unknown")
-            status = log.get("status", "unknown")
-            
-            stats["by_source"][source] = stats["by_source"].get(source, 0) + 1
-            stats["by_target"][target] = stats["by_target"].get(target, 0) + 1
-            stats["by_type"][interaction_type] = stats["by_type"].get(interaction_type, 0) + 1
-            stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
-            
-        return stats
+        return await async_logger.get_stats(since=since, until=until, resolution=resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen der Statistiken: {str(e)}")
 
+@router.get("/latency", response_model=Dict[str, Any])
+async def get_latency(
+    source_system: Optional[str] = Query(None, description="Filter für Quellsystem"),
+    target_system: Optional[str] = Query(None, description="Filter für Zielsystem"),
+    interaction_type: Optional[str] = Query(None, description="Filter für Interaktionstyp"),
+    since: Optional[datetime] = Query(None, description="Beginn des Zeitraums (inklusive)"),
+    until: Optional[datetime] = Query(None, description="Ende des Zeitraums"),
+    resolution: Optional[str] = Query(None, description="Histogramme aus 'minute' oder 'hour' Buckets"),
+    percentiles: str = Query("50,90,95,99", description="Kommagetrennte Perzentile, z.B. 50,99,99.9")
+):
+    """
+    Latenz-Perzentile pro Kante (Quellsystem -> Zielsystem, Interaktionstyp)
+    aus den von den Clients gemeldeten Dauern (duration_ms). Ohne Zeitraum
+    über alle Dauern, sonst über die zusammengeführten Histogramme der
+    Minuten- bzw. Stunden-Buckets des Zeitraums.
+    """
+    try:
+        quantiles = [float(p) / 100 for p in percentiles.split(",") if p.strip()]
+        if not quantiles or any(not 0 <= q <= 1 for q in quantiles):
+            raise ValueError(f"Ungültige Perzentile: {percentiles}")
+        return await async_logger.get_latency(
+            quantiles,
+            filter_source=source_system,
+            filter_target=target_system,
+            filter_type=interaction_type,
+            since=since,
+            until=until,
+            resolution=resolution
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen der Latenzen: {str(e)}")
+
 @router.delete("/", status_code=200, response_model=Dict[str, str])
 async def clear_logs():
     """
@@ -102,9 +357,25 @@ async def clear_logs():
     In einer Produktionsumgebung würde diese Funktion weitere Sicherheitsmaßnahmen erfordern.
     """
     try:
-        # Leere Datei erstellen (überschreibt bestehende)
-        with open(async_logger.log_file_path, 'w') as f:
-            pass
+        await async_logger.clear()
         return {"status": "success", "message": "Logs wurden gelöscht"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Fehler beim Löschen der Logs: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Fehler beim Löschen der Logs: {str(e)}")
+
+@traces_router.get("/{trace_id}", response_model=Dict[str, Any])
+async def get_trace(
+    trace_id: str,
+    limit: int = Query(TRACE_MAX_ENTRIES, ge=1, le=TRACE_MAX_ENTRIES, description="Maximale Anzahl der Hops")
+):
+    """
+    Zeitleiste eines Geschäftsvorgangs (z.B. einer Bestellung) über alle
+    Systeme: alle Log-Einträge mit dieser trace_id in zeitlicher Reihenfolge,
+    mit Dauer zwischen den Hops und Gesamtdauer.
+    """
+    try:
+        entries = await async_logger.get_trace(trace_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen des Traces: {str(e)}")
+    if not entries:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} nicht gefunden")
+    return build_trace_timeline(trace_id, entries)
@@ -0,0 +1,91 @@
+import os
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+
+# Anzahl der letzten Einträge im Broadcast-Ring (gemeinsam für alle Abonnenten)
+LOG_STREAM_RING_SIZE = int(os.getenv("LOG_STREAM_RING_SIZE", "10000"))
+# Standard-Rückstand pro Abonnent, ab dem Einträge übersprungen werden
+LOG_STREAM_MAX_LAG = int(os.getenv("LOG_STREAM_MAX_LAG", "1000"))
+# Sekunden ohne Eintrag, nach denen ein Keepalive gesendet wird
+LOG_STREAM_KEEPALIVE_S = float(os.getenv("LOG_STREAM_KEEPALIVE_S", "15"))
+
+
+class LogBroadcaster:
+    """
+    In-Memory-Ring der zuletzt geschriebenen Log-Einträge für Live-Abonnenten.
+
+    Der Writer legt jeden Batch einmal in den Ring (fortlaufende Sequenznummer,
+    Eintrag und fertig serialisierte JSON-Zeile) und weckt alle Abonnenten über
+    ein gemeinsames Event. Jeder Abonnent hat nur einen eigenen Lesezeiger; sein
+    Puffer ist der Bereich zwischen Zeiger und Kopf des Rings, begrenzt durch
+    max_lag. Fällt ein langsamer Client weiter zurück, werden die ältesten
+    Einträge für ihn übersprungen und ein 'lag'-Ereignis gemeldet (oder die
+    Verbindung beendet). Zusätzliche Abonnenten kosten so weder Kopien noch
+    erneute Serialisierung. Nur aus dem Event-Loop benutzen.
+    """
+    def __init__(self, capacity: int = LOG_STREAM_RING_SIZE):
+        self.capacity = capacity
+        self._slots: List[Optional[Tuple[int, Dict[str, Any], str]]] = [None] * capacity
+        self._next_seq = 1
+        self._changed: Optional[asyncio.Event] = None
+        self.subscribers = 0
+
+    @property
+    def head(self) -> int:
+        """Sequenznummer des nächsten Eintrags."""
+        return self._next_seq
+
+    def publish_many(self, items: List[Tuple[Dict[str, Any], str]]):
+        for entry, line in items:
+            seq = self._next_seq
+            self._slots[seq % self.capacity] = (seq, entry, line)
+            self._next_seq = seq + 1
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def _wait_for_new(self, timeout: float) -> bool:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def subscribe(self, filters: Dict[str, Optional[str]], max_lag: int = LOG_STREAM_MAX_LAG,
+                        after: Optional[int] = None,
+                        keepalive: float = LOG_STREAM_KEEPALIVE_S) -> AsyncIterator[Tuple[str, int, Any]]:
+        """
+        Liefert ('entry', seq, JSON-Zeile) für neue passende Einträge,
+        ('lag', seq, Anzahl übersprungener Einträge) bei Rückstand und
+        ('keepalive', seq, None) nach 'keepalive' Sekunden ohne Eintrag.
+        Mit 'after' beginnt das Abo hinter dieser Sequenznummer, soweit der Ring sie noch enthält.
+        """
+        max_lag = max(1, min(max_lag, self.capacity))
+        cursor = self._next_seq if after is None else min(after + 1, self._next_seq)
+        self.subscribers += 1
+        try:
+            while True:
+                if cursor >= self._next_seq:
+                    if not await self._wait_for_new(keepalive):
+                        yield "keepalive", cursor - 1, None
+                    continue
+
+                oldest_allowed = max(1, self._next_seq - self.capacity, self._next_seq - max_lag)
+                if cursor < oldest_allowed:
+                    yield "lag", oldest_allowed - 1, oldest_allowed - cursor
+                    cursor = oldest_allowed
+
+                end = self._next_seq
+                while cursor < end:
+                    slot = self._slots[cursor % self.capacity]
+                    if slot is None or slot[0] != cursor:
+                        break  # während eines langsamen yield überschrieben; oben neu einordnen
+                    seq, entry, line = slot
+                    cursor += 1
+                    if any(value and entry.get(name) != value for name, value in filters.items()):
+                        continue
+                    yield "entry", seq, line
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,244 @@
+import os
+import sys
+import gzip
+import json
+import mmap
+import struct
+import bisect
+from array import array
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+import orjson
+
+from .segments import entry_timestamp
+from .stats import DIMENSIONS
+
+# Kopf: Magic, Version, Anzahl Einträge, Offset/Länge des Wörterbuchs, Offset der Payloads
+_MAGIC = b"LOGCOL1\n"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")
+_HEADER_SIZE = 64
+_BLOB_LENGTH = struct.Struct("<I")
+
+# Interne Spalten in Dateireihenfolge; die ersten vier sind die Felder aus DIMENSIONS
+ID_FIELDS = tuple(DIMENSIONS)
+
+
+def _column(buffer, offset: int, count: int, code: str):
+    """Spalte fester Breite als Sequenz von Zahlen, auf Little-Endian-Hosts ohne Kopie."""
+    size = array(code).itemsize
+    view = memoryview(buffer)[offset:offset + count * size]
+    if sys.byteorder == "little":
+        return view.cast(code)
+    values = array(code, view)
+    values.byteswap()
+    return values
+
+
+def write_segment(path: str, lines: Iterable[bytes]) -> int:
+    """
+    Schreibt JSONL-Zeilen als spaltenorientiertes Segment:
+
+        Kopf (64 Bytes)
+        ts          float64[n]  Epoch-Sekunden, aufsteigend
+        source_system, target_system, interaction_type, status
+                    uint32[n]   je eine Spalte mit ids ins Wörterbuch
+        blob_offset uint64[n]   Position der Payload relativ zum Payload-Bereich
+        Payloads    je uint32-Länge + JSON-Zeile des Eintrags
+        Wörterbuch  JSON-Liste der internierten Strings
+
+    Alle Zahlen Little-Endian. Die Zeilen werden stabil nach Zeitstempel
+    sortiert, damit Zeitfilter per Binärsuche auf der ts-Spalte laufen.
+    Unlesbare Zeilen werden übersprungen.
+    :return: Anzahl geschriebener Einträge
+    """
+    rows = []
+    strings: Dict[str, int] = {}
+    for line in lines:
+        line = line.rstrip(b"\r\n")
+        if not line.strip():
+            continue
+        try:
+            entry = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            print(f"Fehler beim Dekodieren der Log-Zeile: {line!r}")
+            continue
+        ids = tuple(strings.setdefault(str(entry.get(field, "unknown")), len(strings)) for field in ID_FIELDS)
+        rows.append((entry_timestamp(entry), ids, line))
+    rows.sort(key=lambda row: row[0])
+
+    count = len(rows)
+    ts_column = array("d", (row[0] for row in rows))
+    id_columns = [array("I", (row[1][i] for row in rows)) for i in range(len(ID_FIELDS))]
+    offsets = array("Q")
+    blobs = bytearray()
+    for _, _, line in rows:
+        offsets.append(len(blobs))
+        blobs += _BLOB_LENGTH.pack(len(line))
+        blobs += line
+    columns = [ts_column] + id_columns + [offsets]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+
+    blob_offset = _HEADER_SIZE + sum(column.itemsize * count for column in columns)
+    dictionary = orjson.dumps(sorted(strings, key=strings.get))
+    dict_offset = blob_offset + len(blobs)
+    with open(path, mode="wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, count, dict_offset, len(dictionary), blob_offset)
+                   .ljust(_HEADER_SIZE, b"\0"))
+        for column in columns:
+            column.tofile(file)
+        file.write(blobs)
+        file.write(dictionary)
+    return count
+
+
+def convert_jsonl(src_path: str, dst_path: str) -> int:
+    """Konvertiert eine JSONL-Datei (auch .gz) in ein spaltenorientiertes Segment."""
+    opener = gzip.open if src_path.endswith(".gz") else open
+    tmp_path = dst_path + ".tmp"
+    with opener(src_path, mode="rb") as src:
+        count = write_segment(tmp_path, src)
+    os.replace(tmp_path, dst_path)
+    return count
+
+
+class ColumnarSegment:
+    """
+    Lesezugriff auf ein spaltenorientiertes Segment (siehe write_segment)
+    über mmap. Filter nach Quelle, Ziel, Typ, Status und Zeitraum sowie
+    Zählungen arbeiten nur auf den numerischen Spalten; eine Payload wird
+    erst dekodiert, wenn ihr Eintrag zurückgegeben wird.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, mode="rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, dict_offset, dict_length, blob_offset = _HEADER.unpack_from(self._mmap)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Kein spaltenorientiertes Log-Segment: {path}")
+            self.count = count
+            self.strings: List[str] = orjson.loads(self._mmap[dict_offset:dict_offset + dict_length])
+            self._ids = {value: index for index, value in enumerate(self.strings)}
+            offset = _HEADER_SIZE
+            self.ts = _column(self._mmap, offset, count, "d")
+            offset += 8 * count
+            self.columns = {}
+            for field in ID_FIELDS:
+                self.columns[field] = _column(self._mmap, offset, count, "I")
+                offset += 4 * count
+            self._blob_offsets = _column(self._mmap, offset, count, "Q")
+            self._blob_base = blob_offset
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        # Views auf die mmap müssen vor dem Schließen freigegeben werden
+        for column in [getattr(self, "ts", None), getattr(self, "_blob_offsets", None)] + \
+                list(getattr(self, "columns", {}).values()):
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = {}
+        if not self._mmap.closed:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def line(self, index: int) -> bytes:
+        """JSON-Zeile des Eintrags 'index'."""
+        position = self._blob_base + self._blob_offsets[index]
+        (length,) = _BLOB_LENGTH.unpack_from(self._mmap, position)
+        return self._mmap[position + 4:position + 4 + length]
+
+    def entry(self, index: int) -> Dict[str, Any]:
+        return json.loads(self.line(index))
+
+    def select(self, filters: Dict[str, Optional[str]], since_ts: Optional[float] = None,
+               until_ts: Optional[float] = None, end: Optional[int] = None):
+        """
+        Liefert die Indizes der Einträge mit passenden Spaltenwerten im
+        Zeitraum [since_ts, until_ts), neueste zuerst, nur unterhalb von 'end'.
+        Filter auf Felder ohne Spalte werden hier nicht geprüft.
+        """
+        low = bisect.bisect_left(self.ts, since_ts) if since_ts is not None else 0
+        high = bisect.bisect_left(self.ts, until_ts) if until_ts is not None else self.count
+        if end is not None:
+            high = min(high, end)
+        wanted = []
+        for field, value in filters.items():
+            if value and field in self.columns:
+                if value not in self._ids:
+                    return
+                wanted.append((self.columns[field], self._ids[value]))
+        for index in range(high - 1, low - 1, -1):
+            if all(column[index] == value_id for column, value_id in wanted):
+                yield index
+
+    def _range(self, since_ts: Optional[float], until_ts: Optional[float]) -> Tuple[int, int]:
+        low = bisect.bisect_left(self.ts, since_ts) if since_ts is not None else 0
+        high = bisect.bisect_left(self.ts, until_ts) if until_ts is not None else self.count
+        return low, max(high, low)
+
+    def _counts(self, low: int, high: int) -> Dict[str, Any]:
+        counts = {"total": high - low}
+        for field, key in DIMENSIONS.items():
+            by_id: Dict[int, int] = {}
+            for value_id in self.columns[field][low:high]:
+                by_id[value_id] = by_id.get(value_id, 0) + 1
+            counts[key] = {self.strings[value_id]: n for value_id, n in by_id.items()}
+        return counts
+
+    def aggregate(self, since_ts: Optional[float] = None, until_ts: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Anzahl der Einträge im Zeitraum [since_ts, until_ts) nach Quelle, Ziel,
+        Typ und Status wie in /logs/stats, dazu first_ts/last_ts (Epoch-Sekunden,
+        None ohne Einträge). Liest nur die ts- und id-Spalten, keine Payloads.
+        """
+        low, high = self._range(since_ts, until_ts)
+        counts = self._counts(low, high)
+        counts["first_ts"] = self.ts[low] if high > low else None
+        counts["last_ts"] = self.ts[high - 1] if high > low else None
+        return counts
+
+    def aggregate_buckets(self, width: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Zählungen wie aggregate pro Zeit-Bucket der Breite 'width' Sekunden,
+        aufsteigend als (Bucket-Start, Zählungen). Die Bucket-Grenzen werden per
+        Binärsuche auf der sortierten ts-Spalte gefunden.
+        """
+        buckets = []
+        low = 0
+        while low < self.count:
+            start = int(self.ts[low] // width) * width
+            high = bisect.bisect_left(self.ts, start + width, low)
+            buckets.append((start, self._counts(low, high)))
+            low = high
+        return buckets
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Konvertiert JSONL-Logs in spaltenorientierte Segmente:
+    python -m app.columnar <datei.log[.gz]> ... (Ausgabe jeweils als <datei>.col)
+    """
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        raise SystemExit("Aufruf: python -m app.columnar <datei.log[.gz]> ...")
+    for path in paths:
+        base = path[:-3] if path.endswith(".gz") else path
+        dst_path = os.path.splitext(base)[0] + ".col"
+        count = convert_jsonl(path, dst_path)
+        print(f"{path} -> {dst_path}: {count} Einträge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import os
+import asyncio
+import logging
+import signal
+import struct
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import orjson
+
+# Unix-Socket des zentralen Writer-Prozesses; leer = jeder Prozess schreibt selbst (ein Worker)
+LOG_WRITER_SOCKET = os.getenv("LOG_WRITER_SOCKET", "")
+# Sekunden, die ein Worker beim Start auf den Writer-Prozess wartet
+LOG_WRITER_CONNECT_TIMEOUT_S = float(os.getenv("LOG_WRITER_CONNECT_TIMEOUT_S", "30"))
+# Max. gleichzeitig laufende Anfragen pro Worker-Verbindung, danach liest der Writer nicht weiter
+LOG_WRITER_MAX_INFLIGHT = int(os.getenv("LOG_WRITER_MAX_INFLIGHT", "64"))
+
+# Methoden des AsyncLogger, die Worker im Writer-Prozess aufrufen dürfen
+_REMOTE_METHODS = {"clear", "get_stats", "get_latency", "query_logs", "get_trace"}
+# Argumente, die als ISO-Zeitstempel übertragen werden
+_DATETIME_ARGS = ("since", "until")
+
+_HEADER = struct.Struct(">I")
+
+_logger = logging.getLogger("logging_service.ipc")
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Liest einen Frame (4 Byte Länge, dann Nutzdaten); IncompleteReadError bei Verbindungsende."""
+    size, = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return await reader.readexactly(size)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(_HEADER.pack(len(payload)) + payload)
+
+
+class LogWriterServer:
+    """
+    Writer-Seite des Mehr-Worker-Betriebs: ein einzelner Prozess besitzt den
+    AsyncLogger (SQLite, JSONL-Segmente, Statistik, Wartung) und nimmt über
+    einen Unix-Socket Einträge von beliebig vielen HTTP- und Consumer-Workern
+    an. Alle Einträge laufen so durch denselben Group-Commit-Writer, es gibt
+    genau einen schreibenden Prozess pro Datei.
+
+    Protokoll: Frames aus 4 Byte Länge (big endian) und einem orjson-Objekt.
+    'write' schreibt [Eintrag, Zeile]-Paare und antwortet nach dem Commit,
+    'call' ruft eine Abfrage-Methode des AsyncLogger auf (Statistik, Löschen
+    und Abfragen ohne SQLite-Index), 'tail' schaltet die Verbindung auf einen
+    Strom aller neu geschriebenen Zeilen für /logs/stream der Worker um.
+    """
+    def __init__(self, async_logger, path: str, max_inflight: int = LOG_WRITER_MAX_INFLIGHT):
+        self.logger = async_logger
+        self.path = path
+        self.max_inflight = max_inflight
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Überbleibsel eines abgestürzten Writers
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        _logger.info(f"Log-Writer lauscht auf {self.path}")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Offene Worker-Verbindungen (v.a. Live-Ströme) beenden, sonst wartet wait_closed auf sie
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        inflight = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                request = orjson.loads(await _read_frame(reader))
+                if request.get("op") == "tail":
+                    await self._tail(writer)
+                    return
+                # Anfragen parallel bearbeiten, damit Einträge mehrerer Frames in einen Batch fallen
+                await inflight.acquire()
+                task = asyncio.create_task(self._answer(request, writer))
+                tasks.add(task)
+                task.add_done_callback(lambda t: (tasks.discard(t), inflight.release()))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # Worker beendet oder Writer fährt herunter
+        except Exception as e:
+            _logger.error(f"Fehler in der Worker-Verbindung: {e}")
+        finally:
+            self._connections.discard(connection)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _answer(self, request: Dict[str, Any], writer: asyncio.StreamWriter):
+        response = {"id": request.get("id")}
+        try:
+            op = request.get("op")
+            if op == "write" and request.get("outcomes"):
+                results = await self.logger.log_lines([(entry, line) for entry, line in request["items"]],
+                                                      return_exceptions=True)
+                response["result"] = [None if result is None else str(result) for result in results]
+            elif op == "write":
+                await self.logger.log_lines([(entry, line) for entry, line in request["items"]])
+                response["result"] = None
+            elif op == "call" and request.get("method") in _REMOTE_METHODS:
+                kwargs = request.get("kwargs") or {}
+                for name in _DATETIME_ARGS:
+                    if kwargs.get(name):
+                        kwargs[name] = datetime.fromisoformat(kwargs[name])
+                response["result"] = await getattr(self.logger, request["method"])(**kwargs)
+            else:
+                raise ValueError(f"Unbekannte Anfrage: {op} {request.get('method', '')}".strip())
+        except Exception as e:
+            response["error"] = str(e)
+            response["type"] = type(e).__name__
+        if not writer.is_closing():
+            _write_frame(writer, orjson.dumps(response))
+            await writer.drain()
+
+    async def _tail(self, writer: asyncio.StreamWriter):
+        broadcaster = self.logger.broadcaster
+        async for kind, _, line in broadcaster.subscribe({}, max_lag=broadcaster.capacity):
+            if writer.is_closing():
+                return  # Worker hat die Verbindung beendet
+            if kind != "entry":
+                continue
+            _write_frame(writer, line.encode('utf-8'))
+            if writer.transport.get_write_buffer_size() > 1024 * 1024:
+                await writer.drain()
+
+
+class RemoteLogWriter:
+    """
+    Worker-Seite: leitet Einträge und Abfragen an den LogWriterServer weiter.
+    Alle write()-Aufrufe einer Event-Loop-Runde gehen gesammelt in einem Frame
+    raus. Bricht die Verbindung ab, schlagen offene Anfragen mit
+    ConnectionError fehl; die nächste Anfrage verbindet neu.
+    """
+    def __init__(self, path: str, connect_timeout: float = LOG_WRITER_CONNECT_TIMEOUT_S):
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._next_id = 0
+        self._waiting: Dict[int, List[asyncio.Future]] = {}
+        self._outbox: List[Tuple[Dict[str, Any], str]] = []
+        self._outbox_futures: List[asyncio.Future] = []
+        self._flush_scheduled = False
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        deadline = asyncio.get_running_loop().time() + self.connect_timeout
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise ConnectionError(f"Log-Writer unter {self.path} nicht erreichbar")
+                await asyncio.sleep(0.2)
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await self._open()
+            self._receiver = asyncio.create_task(self._receive(self._reader))
+
+    async def close(self):
+        if self._writer is not None:
+            await self._flush()
+            self._writer.close()
+            self._writer = None
+        if self._receiver is not None:
+            self._receiver.cancel()
+            self._receiver = None
+
+    async def _receive(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                response = orjson.loads(await _read_frame(reader))
+                futures = self._waiting.pop(response.get("id"), [])
+                error = response.get("error")
+                if error is not None:
+                    if not futures:
+                        _logger.error(f"Log-Writer meldet Fehler: {error}")
+                    exception = (ValueError if response.get("type") == "ValueError" else RuntimeError)(error)
+                for future in futures:
+                    if future.done():
+                        continue
+                    if error is not None:
+                        future.set_exception(exception)
+                    else:
+                        future.set_result(response.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            _logger.warning(f"Verbindung zum Log-Writer verloren: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            waiting, self._waiting = self._waiting, {}
+            for futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(ConnectionError("Verbindung zum Log-Writer verloren"))
+
+    async def _send(self, request: Dict[str, Any], futures: List[asyncio.Future]):
+        await self.connect()
+        self._next_id += 1
+        request["id"] = self._next_id
+        self._waiting[self._next_id] = futures
+        _write_frame(self._writer, orjson.dumps(request))
+        await self._writer.drain()  # Backpressure, wenn der Writer nicht nachkommt
+
+    async def write(self, items: List[Tuple[Dict[str, Any], str]], wait: bool = True):
+        """Übergibt Einträge an den Writer-Prozess; mit wait bis zu deren Commit."""
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._outbox.extend(items)
+        if future is not None:
+            self._outbox_futures.append(future)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.ensure_future(self._flush())
+        if future is not None:
+            await future
+
+    async def write_settled(self, items: List[Tuple[Dict[str, Any], str]]) -> List[Optional[str]]:
+        """
+        Übergibt Einträge in einem eigenen Frame und wartet auf deren Commit;
+        liefert pro Eintrag None oder die Fehlermeldung seines Writer-Batches.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._send({"op": "write", "items": items, "outcomes": True}, [future])
+        return await future
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        items, futures = self._outbox, self._outbox_futures
+        self._outbox, self._outbox_futures = [], []
+        if not items:
+            return
+        try:
+            await self._send({"op": "write", "items": items}, futures)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not futures:
+                _logger.error(f"{len(items)} Log-Einträge nicht an den Log-Writer übergeben: {e}")
+
+    async def call(self, method: str, **kwargs) -> Any:
+        """Ruft eine Abfrage-Methode des AsyncLogger im Writer-Prozess auf."""
+        for name in _DATETIME_ARGS:
+            if isinstance(kwargs.get(name), datetime):
+                kwargs[name] = kwargs[name].isoformat()
+        future = asyncio.get_running_loop().create_future()
+        await self._send({"op": "call", "method": method, "kwargs": kwargs}, [future])
+        return await future
+
+    async def tail(self, broadcaster):
+        """Speist neu geschriebene Zeilen des Writers in den lokalen LogBroadcaster (läuft bis cancel)."""
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                _write_frame(writer, orjson.dumps({"op": "tail"}))
+                await writer.drain()
+                while True:
+                    line = (await _read_frame(reader)).decode('utf-8')
+                    broadcaster.publish_many([(orjson.loads(line), line)])
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                _logger.warning(f"Live-Strom vom Log-Writer unterbrochen: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+
+async def _serve(path: str):
+    from .logger import AsyncLogger
+
+    async_logger = AsyncLogger(writer_socket="")
+    await async_logger.start()
+    server = LogWriterServer(async_logger, path)
+    await server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    _logger.info("Log-Writer wird beendet...")
+    await server.close()
+    await async_logger.close()
+
+
+def main():
+    """Startet den Writer-Prozess für den Mehr-Worker-Betrieb (python -m app.ipc)."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not LOG_WRITER_SOCKET:
+        raise SystemExit("LOG_WRITER_SOCKET ist nicht gesetzt")
+    asyncio.run(_serve(LOG_WRITER_SOCKET))
+
+
+if __name__ == "__main__":
+    main()
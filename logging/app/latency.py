@@ -0,0 +1,73 @@
+import math
+from typing import Dict, Any, List, Optional
+
+# Relative Genauigkeit der Perzentile (logarithmische Buckets wie bei DDSketch)
+RELATIVE_ACCURACY = 0.01
+# Kleinere Dauern landen im untersten Bucket
+MIN_DURATION_MS = 0.001
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def empty_histogram() -> Dict[str, Any]:
+    return {"count": 0, "sum": 0.0, "max": 0.0, "bins": {}}
+
+
+def bin_key(duration_ms: float) -> str:
+    """
+    Bucket ceil(log_gamma(d)) einer Dauer. Jeder Bucket deckt einen Bereich
+    mit fester relativer Breite ab, sodass Histogramme durch Addieren der
+    Bucket-Zähler verlustfrei zusammengeführt werden können. Schlüssel sind
+    Strings, damit das Histogramm als JSON speicherbar ist.
+    """
+    return str(math.ceil(math.log(max(duration_ms, MIN_DURATION_MS)) / _LOG_GAMMA))
+
+
+def record(histogram: Dict[str, Any], duration_ms: float, key: Optional[str] = None):
+    """Zählt eine Dauer; key ist ein vorab berechnetes bin_key(duration_ms)."""
+    if key is None:
+        key = bin_key(duration_ms)
+    bins = histogram["bins"]
+    bins[key] = bins.get(key, 0) + 1
+    histogram["count"] += 1
+    histogram["sum"] += duration_ms
+    if duration_ms > histogram["max"]:
+        histogram["max"] = duration_ms
+
+
+def merge(target: Dict[str, Any], source: Dict[str, Any]):
+    target["count"] += source["count"]
+    target["sum"] += source["sum"]
+    target["max"] = max(target["max"], source["max"])
+    bins = target["bins"]
+    for key, count in source["bins"].items():
+        bins[key] = bins.get(key, 0) + count
+
+
+def quantile(histogram: Dict[str, Any], q: float) -> Optional[float]:
+    """Schätzwert des q-Quantils (0..1) mit höchstens RELATIVE_ACCURACY relativem Fehler."""
+    if histogram["count"] == 0:
+        return None
+    rank = q * (histogram["count"] - 1)
+    seen = 0
+    for index in sorted(int(key) for key in histogram["bins"]):
+        seen += histogram["bins"][str(index)]
+        if seen > rank:
+            # Mitte des Buckets (gamma^(i-1), gamma^i]; nie über dem gemessenen Maximum
+            return min(2 * _GAMMA ** index / (_GAMMA + 1), histogram["max"])
+    return histogram["max"]
+
+
+def summarize(histogram: Dict[str, Any], quantiles: List[float]) -> Dict[str, Any]:
+    """Anzahl, Mittelwert, Maximum und die gewünschten Perzentile in ms."""
+    count = histogram["count"]
+    result = {
+        "count": count,
+        "mean_ms": round(histogram["sum"] / count, 3) if count else None,
+        "max_ms": round(histogram["max"], 3) if count else None,
+    }
+    for q in quantiles:
+        value = quantile(histogram, q)
+        result[f"p{q * 100:g}"] = round(value, 3) if value is not None else None
+    return result
@@ -1,19 +1,113 @@
 import os
-import json
+import time
 import asyncio
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-import aiofiles
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Union
+import orjson
+
+from .store import SQLiteLogStore
+from .segments import SegmentedLogFile, entry_timestamp
+from .stats import LogStatistics
+from .broadcast import LogBroadcaster
+from .search import tokenize_query
+from .traces import TRACE_MAX_ENTRIES
+from .ipc import RemoteLogWriter, LOG_WRITER_SOCKET
+
+# Group-Commit-Konfiguration des Writers
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))            # max. wartende Einträge, danach Backpressure
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))              # Einträge pro Schreibvorgang
+LOG_FLUSH_INTERVAL_MS = float(os.getenv("LOG_FLUSH_INTERVAL_MS", "10"))  # max. Wartezeit auf einen vollen Batch
+LOG_DURABILITY = os.getenv("LOG_DURABILITY", "flush")                 # 'flush' (OS-Puffer) oder 'fsync' (pro Batch)
+
+# Speicher für Abfragen: 'sqlite' (indiziert) oder 'jsonl' (Scan der Log-Datei)
+LOG_STORE = os.getenv("LOG_STORE", "sqlite")
+# JSONL-Datei zusätzlich schreiben (bei LOG_STORE=jsonl immer aktiv)
+LOG_JSONL_EXPORT = os.getenv("LOG_JSONL_EXPORT", "true").lower() in ("1", "true", "yes")
+
+# Rotation der JSONL-Datei in Segmente und Aufbewahrung
+LOG_SEGMENT_MAX_BYTES = int(os.getenv("LOG_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+LOG_SEGMENT_MAX_AGE_S = float(os.getenv("LOG_SEGMENT_MAX_AGE_S", "86400"))       # 0 = nur nach Größe
+LOG_COMPRESS_SEGMENTS = os.getenv("LOG_COMPRESS_SEGMENTS", "true").lower() in ("1", "true", "yes")
+LOG_SEGMENT_FORMAT = os.getenv("LOG_SEGMENT_FORMAT", "jsonl")                     # 'jsonl' oder 'columnar'
+LOG_RETENTION_DAYS = float(os.getenv("LOG_RETENTION_DAYS", "14"))                # 0 = unbegrenzt
+LOG_RETENTION_MAX_BYTES = int(os.getenv("LOG_RETENTION_MAX_BYTES", "0"))          # 0 = unbegrenzt
+LOG_MAINTENANCE_INTERVAL_S = float(os.getenv("LOG_MAINTENANCE_INTERVAL_S", "60"))
+
+# Wie weit ein vom Client mitgelieferter Zeitstempel in der Zukunft liegen darf (Uhrenabweichung)
+LOG_TIMESTAMP_MAX_FUTURE_S = float(os.getenv("LOG_TIMESTAMP_MAX_FUTURE_S", "300"))
+
+_logger = logging.getLogger("logging_service.writer")
+
 
 class AsyncLogger:
     """
     Asynchroner Logger für die Protokollierung von Service-Interaktionen.
-    Schreibt die Logs in eine Datei und unterstützt asynchronen Zugriff.
+    Schreibt die Logs in einen indizierten SQLite-Speicher und optional als
+    JSONL-Datei und unterstützt asynchronen Zugriff.
+
+    Alle Einträge laufen über eine begrenzte asyncio-Queue zu einem einzigen
+    Writer-Task, der sie gesammelt schreibt (Group Commit): eine Transaktion
+    bzw. ein write() pro Batch, je nach LOG_DURABILITY mit flush oder fsync.
+    Ist die Queue voll, warten die Produzenten.
+
+    Die JSONL-Datei wird nach Größe und Alter in Segmente rotiert; ein
+    Wartungs-Task komprimiert geschlossene Segmente (bzw. konvertiert sie mit
+    LOG_SEGMENT_FORMAT=columnar in spaltenorientierte Segmente) und löscht
+    Segmente und SQLite-Einträge nach der Aufbewahrungsrichtlinie.
+
+    Statistiken werden beim Schreiben inkrementell gezählt (LogStatistics)
+    und vom Wartungs-Task gespeichert. Geschriebene Batches gehen außerdem an
+    den LogBroadcaster für Live-Abonnenten von /logs/stream.
+
+    Mit writer_socket (LOG_WRITER_SOCKET) läuft der Logger als Worker neben
+    anderen: Einträge, Statistik und Löschen gehen an den einzigen
+    Writer-Prozess (python -m app.ipc), Abfragen lesen direkt aus der
+    gemeinsamen SQLite-Datenbank, und der Live-Strom kommt vom Writer.
     """
-    def __init__(self, log_dir: str = "logs", log_file: str = "system_interactions.log"):
+    def __init__(self, log_dir: str = "logs", log_file: str = "system_interactions.log",
+                 queue_size: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval_ms: float = LOG_FLUSH_INTERVAL_MS, durability: str = LOG_DURABILITY,
+                 store: str = LOG_STORE, jsonl_export: bool = LOG_JSONL_EXPORT,
+                 segment_max_bytes: int = LOG_SEGMENT_MAX_BYTES, segment_max_age_s: float = LOG_SEGMENT_MAX_AGE_S,
+                 compress_segments: bool = LOG_COMPRESS_SEGMENTS, retention_days: float = LOG_RETENTION_DAYS,
+                 retention_max_bytes: int = LOG_RETENTION_MAX_BYTES,
+                 maintenance_interval_s: float = LOG_MAINTENANCE_INTERVAL_S,
+                 segment_format: str = LOG_SEGMENT_FORMAT,
+                 writer_socket: str = LOG_WRITER_SOCKET):
+        if durability not in ("flush", "fsync"):
+            raise ValueError(f"Unbekannter Durability-Modus: {durability}")
+        if store not in ("sqlite", "jsonl"):
+            raise ValueError(f"Unbekannter Log-Speicher: {store}")
         self.log_dir = log_dir
         self.log_file = log_file
         self.log_file_path = os.path.join(log_dir, log_file)
+        self.jsonl_export = jsonl_export or store == "jsonl"
+        self.store = SQLiteLogStore(os.path.join(log_dir, "system_interactions.db"), durability) \
+            if store == "sqlite" else None
+        # Ohne SQLite-Speicher pflegen die Segmente den Volltextindex selbst
+        self.segments = SegmentedLogFile(log_dir, log_file, segment_max_bytes, segment_max_age_s,
+                                         durability, compress_segments, segment_format,
+                                         index=self.store is None) if self.jsonl_export else None
+        self.stats = LogStatistics(os.path.join(log_dir, "stats.json"))
+        self.broadcaster = LogBroadcaster()
+        self.retention = retention_days * 86400
+        self.retention_max_bytes = retention_max_bytes
+        self.maintenance_interval = maintenance_interval_s
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.durability = durability
+        self.writer_socket = writer_socket
+        self.remote: Optional[RemoteLogWriter] = None
+        self._started = False
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._tail_task: Optional[asyncio.Task] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._maintenance_wakeup: Optional[asyncio.Event] = None
         self.ensure_log_directory()
         
     def ensure_log_directory(self):
@@ -21,10 +115,195 @@ class AsyncLogger:
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
             print(f"Log-Verzeichnis {self.log_dir} erstellt")
-            
+
+    async def start(self):
+        """Öffnet die Log-Datei und startet den Writer-Task (idempotent)."""
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        # Gleichzeitige erste Aufrufer warten auf denselben Start (sonst je eine Verbindung und ein Tail-Task)
+        async with self._start_lock:
+            if self._started:
+                return
+            await self._start()
+
+    async def _start(self):
+        if self.writer_socket:
+            # Worker: Schreiben übernimmt der Writer-Prozess, die Datenbank wird nur gelesen
+            remote = RemoteLogWriter(self.writer_socket)
+            await remote.connect()
+            self.remote = remote
+            self._tail_task = asyncio.create_task(remote.tail(self.broadcaster))
+            self._started = True
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._batch_ready = asyncio.Event()
+        if self.store is not None:
+            self.store.open()
+        if self.segments is not None:
+            self.segments.open()
+        if not self.stats.load() and self.segments is not None:
+            # Ohne stats.json die Zähler aus den vorhandenen Segmenten wiederherstellen
+            count = await asyncio.get_running_loop().run_in_executor(None, self.segments.rebuild_stats, self.stats)
+            if count:
+                print(f"Statistik aus {count} Einträgen der Segmente wiederhergestellt")
+        self._maintenance_wakeup = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._writer())
+        self._maintenance_task = asyncio.create_task(self._maintenance())
+        self._started = True
+
+    async def close(self):
+        """Schreibt alle wartenden Einträge und beendet den Writer-Task."""
+        if not self._started:
+            return
+        self._started = False
+        if self.remote is not None:
+            self._tail_task.cancel()
+            try:
+                await self._tail_task
+            except asyncio.CancelledError:
+                pass
+            self._tail_task = None
+            await self.remote.close()
+            self.remote = None
+            return
+        await self._queue.put(None)
+        self._batch_ready.set()
+        await self._writer_task
+        self._writer_task = None
+        self._maintenance_task.cancel()
+        try:
+            await self._maintenance_task
+        except asyncio.CancelledError:
+            pass
+        self._maintenance_task = None
+        if self.store is not None:
+            self.store.close()
+        if self.segments is not None:
+            self.segments.close()
+        if self.stats.dirty:
+            self.stats.save(self.stats.dump())
+
+    async def clear(self):
+        """Löscht alle gespeicherten Logs (nur für Testzwecke)."""
+        if not self._started:
+            await self.start()
+        if self.remote is not None:
+            return await self.remote.call("clear")
+        self.stats.clear()
+        data = self.stats.dump()
+        await asyncio.get_running_loop().run_in_executor(None, self._clear)
+        await asyncio.get_running_loop().run_in_executor(None, self.stats.save, data)
+
+    def _clear(self):
+        if self.store is not None:
+            self.store.clear()
+        if self.segments is not None:
+            self.segments.clear()
+
+    async def _maintenance(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._maintenance_wakeup.wait(), self.maintenance_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._maintenance_wakeup.clear()
+            try:
+                if self.stats.dirty:
+                    await loop.run_in_executor(None, self.stats.save, self.stats.dump())
+                await loop.run_in_executor(None, self._maintain)
+            except Exception as e:
+                _logger.error(f"Fehler bei der Log-Wartung: {e}")
+
+    def _maintain(self):
+        # Läuft im Thread-Pool: Komprimierung und Aufbewahrung
+        if self.segments is not None:
+            self.segments.compress_pending()
+            removed = self.segments.enforce_retention(self.retention, self.retention_max_bytes)
+            if removed:
+                _logger.info(f"{removed} Log-Segmente nach Aufbewahrungsrichtlinie gelöscht")
+        if self.store is not None and self.retention > 0:
+            self.store.delete_before(time.time() - self.retention)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            # Kurz warten, damit sich ein Batch füllen kann, außer er ist schon voll
+            if first is not None and self._queue.qsize() < self.batch_size - 1 and self.flush_interval > 0:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+                # Nach dem Stop-Signal eingereihte Einträge ebenfalls schreiben
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+            if not batch:
+                continue
+
+            timestamps = [entry_timestamp(entry) for entry, _, _ in batch]
+            try:
+                rotated = await loop.run_in_executor(None, self._write_batch, batch, timestamps)
+            except Exception as e:
+                _logger.error(f"Fehler beim Schreiben von {len(batch)} Log-Einträgen: {e}")
+                for _, _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                continue
+            # Nur geschriebene Einträge zählen; ein fehlerhafter Eintrag darf den Writer nicht beenden
+            for (entry, _, future), ts in zip(batch, timestamps):
+                try:
+                    self.stats.add(entry, ts)
+                except Exception as e:
+                    _logger.error(f"Fehler beim Zählen eines Log-Eintrags: {e}")
+                if future is not None and not future.done():
+                    future.set_result(None)
+            try:
+                self.broadcaster.publish_many([(entry, line) for entry, line, _ in batch])
+            except Exception as e:
+                _logger.error(f"Fehler beim Verteilen von {len(batch)} Log-Einträgen an Live-Abonnenten: {e}")
+            if rotated:
+                # Geschlossenes Segment im Hintergrund komprimieren
+                self._maintenance_wakeup.set()
+
+    def _write_batch(self, batch, timestamps: List[float]) -> bool:
+        # Läuft im Thread-Pool, damit der Event-Loop nicht auf die Platte wartet
+        if self.store is not None:
+            self.store.write_batch([(ts, entry, line) for ts, (entry, line, _) in zip(timestamps, batch)])
+        if self.segments is not None:
+            # Nachgelieferte Einträge können älter sein als der Rest des Batches
+            return self.segments.append([line for _, line, _ in batch], min(timestamps), max(timestamps))
+        return False
+
+    async def _enqueue(self, entry: Dict[str, Any], line: str, wait: bool):
+        if not self._started:
+            await self.start()
+        if self.remote is not None:
+            return await self.remote.write([(entry, line)], wait)
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self._queue.put((entry, line, future))  # blockiert bei voller Queue (Backpressure)
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        if future is not None:
+            await future
+
     async def log_interaction(self, source_system: str, target_system: str, interaction_type: str, 
                              message: Dict[str, Any], status: str = "success", 
-                             error_message: Optional[str] = None):
+                             error_message: Optional[str] = None, wait: bool = True,
+                             trace_id: Optional[str] = None, duration_ms: Optional[float] = None):
         """
         Protokolliert eine Interaktion zwischen zwei Systemen asynchron in der Log-Datei.
         
@@ -34,75 +313,242 @@ class AsyncLogger:
         :param message: Die Nachricht/Daten, die ausgetauscht wurden
         :param status: Status der Interaktion ('success' oder 'error')
         :param error_message: Fehler-Nachricht, falls Status 'error' ist
+        :param wait: True wartet, bis der Batch mit dem Eintrag geschrieben ist
+        :param trace_id: Korrelations-ID des Geschäftsvorgangs (z.B. einer Bestellung)
+        :param duration_ms: Vom Client gemessene Dauer der Interaktion in Millisekunden
         """
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "source_system": source_system,
-            "target_system": target_system,
-            "interaction_type": interaction_type,
-            "message": message,
-            "status": status
-        }
-        
-        if error_message:
-            log_entry["error_message"] = error_message
+        log_entry = build_log_entry(source_system, target_system, interaction_type, message, status,
+                                    error_message, trace_id, duration_ms)
             
         # Formatieren als JSON-Zeile
-        log_line = json.dumps(log_entry) + "\n"
+        log_line = orjson.dumps(log_entry).decode('utf-8')
         
-        # Asynchron in die Datei schreiben
-        async with aiofiles.open(self.log_file_path, mode='a', encoding='utf-8') as file:
-            await file.write(log_line)
-            await file.flush()  # Sicherstellen, dass die Daten sofort geschrieben werden
-            
-        print(f"Interaktion protokolliert: {source_system} -> {target_system}")
+        # An den Writer-Task übergeben
+        await self._enqueue(log_entry, log_line, wait)
+        _logger.debug(f"Interaktion protokolliert: {source_system} -> {target_system}")
+
+    async def log_many(self, entries: List[Dict[str, Any]], return_exceptions: bool = False):
+        """
+        Protokolliert mehrere mit build_log_entry erzeugte Einträge und wartet,
+        bis alle geschrieben sind. Die Einträge landen in möglichst wenigen
+        Writer-Batches; schlägt ein Batch fehl, wird der Fehler weitergereicht.
+        Mit return_exceptions gibt es stattdessen pro Eintrag None oder den
+        Fehler seines Batches zurück.
+        """
+        return await self.log_lines([(log_entry, orjson.dumps(log_entry).decode('utf-8')) for log_entry in entries],
+                                    return_exceptions)
+
+    async def log_lines(self, items: List[Tuple[Dict[str, Any], str]],
+                        return_exceptions: bool = False) -> Optional[List[Optional[Exception]]]:
+        """
+        Wie log_many, aber mit fertig serialisierten Zeilen (Ingest ohne erneutes
+        Kodieren, siehe build_log_line). Der Eintrag muss nur die Felder für
+        Index, Filter und Statistik enthalten, nicht die Nachricht.
+        """
+        if not items:
+            return [] if return_exceptions else None
+        if not self._started:
+            await self.start()
+        if self.remote is not None:
+            if not return_exceptions:
+                return await self.remote.write(items)
+            errors = await self.remote.write_settled(items)
+            return [None if error is None else RuntimeError(error) for error in errors]
+        loop = asyncio.get_running_loop()
+        futures = []
+        for log_entry, log_line in items:
+            future = loop.create_future()
+            await self._queue.put((log_entry, log_line, future))  # Backpressure
+            futures.append(future)
+        self._batch_ready.set()
+        results = await asyncio.gather(*futures, return_exceptions=return_exceptions)
+        return results if return_exceptions else None
         
+
+
     async def get_logs(self, limit: int = 100, filter_source: Optional[str] = None, 
-                      filter_target: Optional[str] = None, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+                      filter_target: Optional[str] = None, filter_type: Optional[str] = None,
+                      filter_status: Optional[str] = None, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """
-        Liest die letzten 'limit' Log-Einträge aus der Datei.
-        Mit optionalen Filtern für Quellsystem, Zielsystem und Interaktionstyp.
+        Liest die letzten 'limit' Log-Einträge, neueste zuerst.
+        Mit optionalen Filtern für Quellsystem, Zielsystem, Interaktionstyp,
+        Status und Zeitraum [since, until).
         
         :return: Liste der Log-Einträge
         """
-        logs = []
-        
-        # Prüfen, ob Log-Datei existiert
-        if not os.path.exists(self.log_file_path):
-            return logs
-            
-        try:
-            async with aiofiles.open(self.log_file_path, mode='r', encoding='utf-8') as file:
-                lines = await file.readlines()
-                
-                # Reversed, um die neuesten zuerst zu bekommen
-                for line in reversed(lines):
-                    if not line.strip():
-                        continue
-                        
-                    try:
-                        log_entry = json.loads(line)
-                        
-                        # Filter anwenden, wenn angegeben
-                        if filter_source and log_entry.get("source_system") != filter_source:
-                            continue
-                        if filter_target and log_entry.get("target_system") != filter_target:
-                            continue
-                        if filter_type and log_entry.get("interaction_type") != filter_type:
-                            continue
-                            
-                        logs.append(log_entry)
-                        
-                        # Limit prüfen
-                        if len(logs) >= limit:
-                            break
-                    except json.JSONDecodeError:
-                        print(f"Fehler beim Dekodieren der Log-Zeile: {line}")
-                        continue
-        except Exception as e:
-            print(f"Fehler beim Lesen der Logs: {str(e)}")
-            
+        logs, _ = await self.query_logs(limit, filter_source, filter_target, filter_type,
+                                        filter_status, since, until)
         return logs
 
+
+    async def get_stats(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Statistik über alle protokollierten Interaktionen oder einen Zeitraum,
+        aus den inkrementell gepflegten Zählern (ohne die Logs zu lesen).
+
+        :raises ValueError: bei unbekannter Auflösung
+        """
+        if not self._started:
+            await self.start()
+        if self.remote is not None:
+            return await self.remote.call("get_stats", since=since, until=until, resolution=resolution)
+        return self.stats.summary(since, until, resolution)
+
+    async def get_latency(self, quantiles: List[float], filter_source: Optional[str] = None,
+                          filter_target: Optional[str] = None, filter_type: Optional[str] = None,
+                          since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Latenz-Perzentile pro Kante (Quelle -> Ziel, Typ) aus den beim Schreiben
+        gepflegten Histogrammen, über alle Dauern oder einen Zeitraum.
+
+        :raises ValueError: bei unbekannter Auflösung
+        """
+        if not self._started:
+            await self.start()
+        if self.remote is not None:
+            return await self.remote.call("get_latency", quantiles=quantiles, filter_source=filter_source,
+                                          filter_target=filter_target, filter_type=filter_type,
+                                          since=since, until=until, resolution=resolution)
+        filters = {
+            "source_system": filter_source,
+            "target_system": filter_target,
+            "interaction_type": filter_type,
+        }
+        return self.stats.latency(quantiles, filters, since, until, resolution)
+
+    async def query_logs(self, limit: int = 100, filter_source: Optional[str] = None,
+                         filter_target: Optional[str] = None, filter_type: Optional[str] = None,
+                         filter_status: Optional[str] = None, since: Optional[datetime] = None,
+                         until: Optional[datetime] = None, cursor: Optional[str] = None,
+                         tokens: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Wie get_logs, aber seitenweise: liefert zusätzlich den Cursor für die
+        nächste (ältere) Seite, oder None, wenn es keine weiteren Einträge gibt.
+        Mit 'tokens' nur Einträge, deren Nachricht alle Tokens enthält.
+
+        :raises ValueError: bei ungültigem Cursor
+        """
+        if limit <= 0:
+            return [], None
+        filters = {
+            "source_system": filter_source,
+            "target_system": filter_target,
+            "interaction_type": filter_type,
+            "status": filter_status,
+        }
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+        if not self._started:
+            await self.start()
+        loop = asyncio.get_running_loop()
+
+        if self.store is not None:
+            if cursor is not None and not cursor.isdigit():
+                raise ValueError(f"Ungültiger Cursor: {cursor}")
+            return await loop.run_in_executor(
+                None, self.store.query, limit, filters, since_ts, until_ts, cursor, tokens
+            )
+        if self.remote is not None:
+            # Ohne SQLite-Index kennt nur der Writer-Prozess die aktiven Segmente
+            logs, next_cursor = await self.remote.call(
+                "query_logs", limit=limit, filter_source=filter_source, filter_target=filter_target,
+                filter_type=filter_type, filter_status=filter_status, since=since, until=until,
+                cursor=cursor, tokens=tokens)
+            return logs, next_cursor
+        return await loop.run_in_executor(
+            None, self.segments.scan, limit, filters, since_ts, until_ts, cursor, tokens
+        )
+
+    async def get_trace(self, trace_id: str, limit: int = TRACE_MAX_ENTRIES) -> List[Dict[str, Any]]:
+        """Alle Einträge mit dieser trace_id (höchstens 'limit'), älteste zuerst."""
+        if not self._started:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        if self.store is not None:
+            return await loop.run_in_executor(None, self.store.trace, trace_id, limit)
+        if self.remote is not None:
+            return await self.remote.call("get_trace", trace_id=trace_id, limit=limit)
+        # Ohne Index: Segmente nach der trace_id filtern (neueste zuerst) und umdrehen
+        logs, _ = await loop.run_in_executor(
+            None, self.segments.scan, limit, {"trace_id": trace_id}, None, None, None
+        )
+        return logs[::-1]
+
+    async def search_logs(self, query: str, limit: int = 100, filter_source: Optional[str] = None,
+                          filter_target: Optional[str] = None, filter_type: Optional[str] = None,
+                          filter_status: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None,
+                          cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Volltextsuche über die Nachrichten: Einträge, die alle Wörter der
+        Anfrage enthalten (neueste zuerst), seitenweise wie query_logs.
+
+        :raises ValueError: bei leerer Anfrage oder ungültigem Cursor
+        """
+        tokens = tokenize_query(query)
+        if not tokens:
+            raise ValueError(f"Keine suchbaren Wörter in der Anfrage: {query!r}")
+        return await self.query_logs(limit, filter_source, filter_target, filter_type, filter_status,
+                                     since, until, cursor, tokens)
+
+
+def client_timestamp(value: Union[str, bytes, datetime]) -> datetime:
+    """
+    Zeitstempel, den ein Client beim Erzeugen des Eintrags gesetzt hat, als
+    Ortszeit ohne Zeitzone wie alle gespeicherten Zeitstempel; ohne Zeitzone
+    gilt er bereits als Ortszeit. Löst ValueError aus, wenn er unlesbar ist
+    oder mehr als LOG_TIMESTAMP_MAX_FUTURE_S in der Zukunft liegt.
+    """
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    timestamp = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    if timestamp > datetime.now() + timedelta(seconds=LOG_TIMESTAMP_MAX_FUTURE_S):
+        raise ValueError(f"liegt mehr als {LOG_TIMESTAMP_MAX_FUTURE_S:g} s in der Zukunft")
+    return timestamp
+
+
+def build_log_entry(source_system: str, target_system: str, interaction_type: str,
+                    message: Optional[Dict[str, Any]], status: str = "success",
+                    error_message: Optional[str] = None, trace_id: Optional[str] = None,
+                    duration_ms: Optional[float] = None,
+                    timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Erzeugt einen Log-Eintrag mit dem aktuellen Zeitstempel, bei nachgelieferten
+    Einträgen mit 'timestamp' (Ortszeit ohne Zeitzone). Mit message=None fehlt
+    das Feld 'message' (Envelope für build_log_line).
+    """
+    log_entry = {
+        "timestamp": (timestamp or datetime.now()).isoformat(),
+        "source_system": source_system,
+        "target_system": target_system,
+        "interaction_type": interaction_type,
+        "message": message,
+        "status": status
+    }
+    if message is None:
+        del log_entry["message"]
+    if error_message:
+        log_entry["error_message"] = error_message
+    if trace_id:
+        log_entry["trace_id"] = trace_id
+    if duration_ms is not None:
+        log_entry["duration_ms"] = duration_ms
+    return log_entry
+
+
+def build_log_line(log_entry: Dict[str, Any], message_json: bytes) -> str:
+    """
+    JSON-Zeile aus den Envelope-Feldern (ohne 'message') und den unveränderten
+    JSON-Bytes der Nachricht: nur der kleine Präfix wird kodiert, die Nachricht
+    wird durchgereicht. message_json muss ein einzeiliges JSON-Objekt sein.
+    """
+    return (orjson.dumps(log_entry)[:-1] + b',"message":' + message_json + b'}').decode('utf-8')
+
+
 # Singleton-Instanz des Loggers erstellen
 async_logger = AsyncLogger()
\ No newline at end of file
@@ -4,8 +4,9 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api import router as logs_router
+from .api import router as logs_router, traces_router
 from .rabbitmq_consumer import rabbitmq_consumer
+from .logger import async_logger
 
 # Konfiguration des Loggings für den Service selbst
 logging.basicConfig(
@@ -37,6 +38,7 @@ app.add_middleware(
 
 # API-Router einbinden
 app.include_router(logs_router)
+app.include_router(traces_router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -46,6 +48,9 @@ async def startup_event():
     """
     logger.info("Logging-Service wird gestartet...")
     
+    # Writer-Task für die Log-Datei starten
+    await async_logger.start()
+    
     # RabbitMQ-Konsumenten im Hintergrund starten
     asyncio.create_task(rabbitmq_consumer.start())
     
@@ -62,6 +67,9 @@ async def shutdown_event():
     # RabbitMQ-Konsumenten stoppen
     await rabbitmq_consumer.stop()
     
+    # Wartende Log-Einträge schreiben und Datei schließen
+    await async_logger.close()
+    
     logger.info("Logging-Service erfolgreich heruntergefahren!")
 
 @app.get("/")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
 from datetime import datetime
 
@@ -12,6 +12,17 @@ class LogRequest(BaseModel):
     message: Dict[str, Any]
     status: str = "success"
     error_message: Optional[str] = None
+    trace_id: Optional[str] = None
+    # Vom Client gemessene Dauer; nur endliche Werte >= 0 (1e999 wäre sonst inf)
+    duration_ms: Optional[float] = Field(None, ge=0, allow_inf_nan=False)
+
+class LogBatchItem(LogRequest):
+    """
+    Eintrag für POST /logs/batch. Nachgelieferte Einträge behalten den
+    Zeitstempel, den der Client beim Erzeugen gesetzt hat; ohne Zeitzone
+    gilt er wie die gespeicherten Zeitstempel als Ortszeit des Servers.
+    """
+    timestamp: Optional[datetime] = None
 
 class LogEntry(BaseModel):
     """
@@ -23,4 +34,6 @@ class LogEntry(BaseModel):
     interaction_type: str
     message: Dict[str, Any]
     status: str
-    error_message: Optional[str] = None
\ No newline at end of file
+    error_message: Optional[str] = None
+    trace_id: Optional[str] = None
+    duration_ms: Optional[float] = None
\ No newline at end of file
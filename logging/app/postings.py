@@ -0,0 +1,150 @@
+import os
+import sys
+import mmap
+import struct
+import bisect
+from array import array
+from typing import Dict, List, Iterable, Optional, Sequence
+
+from .search import tokenize_line
+
+# Kopf: Magic, Version, Anzahl Tokens, Anzahl Positionen
+_MAGIC = b"LOGIDX1\n"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")
+_HEADER_SIZE = 32
+
+
+def add_postings(postings: Dict[str, List[int]], position: int, line: str):
+    """Trägt die Tokens einer Log-Zeile mit ihrer Position in 'postings' ein."""
+    for token in tokenize_line(line):
+        postings.setdefault(token, []).append(position)
+
+
+def write_index(path: str, postings: Dict[str, List[int]]):
+    """
+    Schreibt den invertierten Index eines Segments (Token -> aufsteigende
+    Positionen der Einträge im Segment):
+
+        Kopf (32 Bytes)
+        token_offsets   uint64[n+1]  Grenzen der Tokens im Token-Bereich
+        posting_starts  uint64[n+1]  Grenzen der Positionslisten
+        positions       uint64[m]    je Token aufsteigend
+        Tokens          UTF-8, nach Bytes sortiert und aneinandergehängt
+
+    Positionen sind Byte-Offsets der Zeilen (JSONL, auch nach gzip) bzw.
+    Zeilennummern (spaltenorientierte Segmente). Wird atomar ersetzt.
+    """
+    entries = sorted((token.encode("utf-8"), positions) for token, positions in postings.items())
+    token_offsets = array("Q", [0])
+    posting_starts = array("Q", [0])
+    positions = array("Q")
+    tokens = bytearray()
+    for token, token_positions in entries:
+        tokens += token
+        token_offsets.append(len(tokens))
+        positions.extend(sorted(set(token_positions)))
+        posting_starts.append(len(positions))
+    columns = [token_offsets, posting_starts, positions]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode="wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, len(entries), len(positions)).ljust(_HEADER_SIZE, b"\0"))
+        for column in columns:
+            column.tofile(file)
+        file.write(tokens)
+    os.replace(tmp_path, path)
+
+
+def _read_column(buffer, offset: int, count: int) -> array:
+    values = array("Q")
+    values.frombytes(buffer[offset:offset + count * 8])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class SegmentIndex:
+    """
+    Lesezugriff auf einen Segment-Index (siehe write_index) über mmap.
+    Tokens werden per Binärsuche gefunden; gelesen werden nur die
+    Positionslisten der gesuchten Tokens.
+    """
+    def __init__(self, path: str):
+        with open(path, mode="rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.count, self._total = _HEADER.unpack_from(self._mmap)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Kein Log-Segment-Index: {path}")
+            self._token_offsets = _HEADER_SIZE
+            self._posting_starts = self._token_offsets + 8 * (self.count + 1)
+            self._positions = self._posting_starts + 8 * (self.count + 1)
+            self._tokens = self._positions + 8 * self._total
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._mmap.closed:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _bounds(self, base: int, index: int) -> Sequence[int]:
+        return _read_column(self._mmap, base + 8 * index, 2)
+
+    def _token(self, index: int) -> bytes:
+        start, end = self._bounds(self._token_offsets, index)
+        return self._mmap[self._tokens + start:self._tokens + end]
+
+    def positions(self, token: str) -> Sequence[int]:
+        """Aufsteigende Positionen der Einträge mit 'token' (leer, wenn unbekannt)."""
+        wanted = token.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._token(middle) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._token(low) != wanted:
+            return array("Q")
+        start, end = self._bounds(self._posting_starts, low)
+        return _read_column(self._mmap, self._positions + 8 * start, end - start)
+
+    def match(self, tokens: Iterable[str]) -> List[int]:
+        """Aufsteigende Positionen der Einträge, die alle 'tokens' enthalten."""
+        return match_postings([self.positions(token) for token in tokens])
+
+
+def match_postings(lists: List[Sequence[int]]) -> List[int]:
+    """
+    Schnittmenge aufsteigender Positionslisten: jede Position der kürzesten
+    Liste wird per Binärsuche in den übrigen gesucht.
+    """
+    if not lists:
+        return []
+    shortest, *others = sorted(lists, key=len)
+    return [position for position in shortest if all(_contains(other, position) for other in others)]
+
+
+def _contains(positions: Sequence[int], position: int) -> bool:
+    index = bisect.bisect_left(positions, position)
+    return index < len(positions) and positions[index] == position
+
+
+def load_match(path: str, tokens: Iterable[str]) -> Optional[List[int]]:
+    """Treffer laut Index-Datei 'path'; None, wenn das Segment (noch) keinen Index hat."""
+    try:
+        index = SegmentIndex(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    with index:
+        return index.match(tokens)
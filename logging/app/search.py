@@ -0,0 +1,103 @@
+import re
+import logging
+from typing import List, Set
+
+# Max. verschiedene Tokens pro Eintrag, damit große Payloads den Index nicht aufblähen
+MAX_TOKENS_PER_ENTRY = 512
+
+# Wörter samt zusammengesetzter Bezeichner wie ORD-42, kunde@example.com oder 1.5
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-.@:/+]\w+)*")
+_PART_PATTERN = re.compile(r"\w{2,}")
+# JSON-Escapes im Rohtext: \uXXXX wird zum Zeichen, alle anderen (\n, \", \\ ...) zum Trenner
+_ESCAPE_PATTERN = re.compile(r"\\(?:u([0-9a-fA-F]{4})|.)")
+
+# JSON-Literale und Feldnamen der Envelope werden nie indiziert
+_STOP_WORDS = {"true", "false", "null", "message", "status", "error_message"}
+_MESSAGE_KEY = '"message":'
+
+_logger = logging.getLogger("logging_service.search")
+
+
+def _unescape(match: re.Match) -> str:
+    code = match.group(1)
+    return chr(int(code, 16)) if code else " "
+
+
+def _value_end(text: str, start: int) -> int:
+    """Ende des JSON-Werts ab 'start' im Rohtext (Klammern außerhalb von Strings zählen)."""
+    depth = 0
+    in_string = False
+    index = start
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if char == "\\":
+                index += 1
+            elif char == '"':
+                in_string = False
+                if depth == 0:
+                    return index + 1
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            if depth == 0:
+                return index  # Ende des umgebenden Objekts (Wert war ein Literal)
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        elif char == "," and depth == 0:
+            return index
+        index += 1
+    return len(text)
+
+
+def _message_span(line: str) -> str:
+    """Rohtext des Werts von "message" einer Log-Zeile (leer ohne Nachricht)."""
+    start = line.find(_MESSAGE_KEY)
+    if start < 0:
+        return ""
+    start += len(_MESSAGE_KEY)
+    return line[start:_value_end(line, start)]
+
+
+def tokenize_line(line: str) -> Set[str]:
+    """
+    Tokens für den Volltextindex einer Log-Zeile: Schlüssel und Werte der
+    Nachricht (nur der Wert des Felds "message"; Status, Fehlermeldung,
+    trace_id und Dauer der Envelope nicht). Arbeitet direkt auf dem
+    JSON-Text, die Nachricht wird nicht dekodiert; nur Escapes werden
+    aufgelöst, da Clients mit ensure_ascii senden ("M\\u00fcller" wird als
+    "müller" indiziert). Nach MAX_TOKENS_PER_ENTRY Tokens wird der Rest des
+    Eintrags nicht mehr indiziert.
+    """
+    text = _message_span(line)
+    if "\\" in text:
+        text = _ESCAPE_PATTERN.sub(_unescape, text)
+    tokens = set()
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if len(token) > 1 and token not in _STOP_WORDS:
+            tokens.add(token)
+        if not token.isalnum():
+            # Bestandteile zusammengesetzter Bezeichner ebenfalls indizieren
+            tokens.update(part for part in _PART_PATTERN.findall(token) if part not in _STOP_WORDS)
+        if len(tokens) >= MAX_TOKENS_PER_ENTRY:
+            _logger.debug(f"Eintrag hat mehr als {MAX_TOKENS_PER_ENTRY} Tokens, Rest wird nicht indiziert")
+            break
+    return tokens
+
+
+def tokenize_query(query: str) -> List[str]:
+    """
+    Tokens einer Suchanfrage; alle müssen im Eintrag vorkommen (UND).
+    Zusammengesetzte Bezeichner werden als Ganzes gesucht ('ORD-1' findet
+    nicht 'ORD-10').
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(query):
+        token = match.group().lower()
+        if len(token) > 1 and token not in _STOP_WORDS and token not in tokens:
+            tokens.append(token)
+    return tokens
@@ -0,0 +1,555 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, NamedTuple
+
+from .search import tokenize_line
+from .postings import add_postings, write_index, load_match, match_postings
+
+# Blockgröße beim Rückwärtslesen der Log-Datei
+READ_CHUNK_SIZE = 64 * 1024
+
+# <Name>.<Sequenz>.<ältester Zeitstempel ms>-<jüngster Zeitstempel ms>.log[.gz] bzw. .col (spaltenorientiert)
+_SEGMENT_PATTERN = re.compile(
+    r"^(?P<stem>.+)\.(?P<seq>\d{8})\.(?P<first>\d+)-(?P<last>\d+)\.(?:log(?P<gz>\.gz)?|(?P<col>col))$")
+
+SEGMENT_FORMATS = ("jsonl", "columnar")
+
+
+class Segment(NamedTuple):
+    seq: int
+    first_ts: float
+    last_ts: float
+    path: str
+    compressed: bool
+    columnar: bool = False
+
+
+def entry_timestamp(entry: Dict[str, Any]) -> float:
+    """Zeitstempel eines Log-Eintrags als Epoch-Sekunden (0.0, wenn unlesbar)."""
+    try:
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+class SegmentedLogFile:
+    """
+    JSONL-Log aus Segmenten. Geschrieben wird immer in das aktive Segment
+    (<log_dir>/<log_file>); überschreitet es max_bytes oder ist sein erster
+    Eintrag älter als max_age Sekunden, wird es nach <log_dir>/segments/
+    verschoben. Der Dateiname trägt Sequenznummer und Zeitgrenzen des
+    Segments, so dass Abfragen nur die Segmente öffnen, die ihren Zeitraum
+    berühren. Geschlossene Segmente werden im Hintergrund mit gzip
+    komprimiert (oder mit segment_format='columnar' in spaltenorientierte
+    Segmente konvertiert, siehe app.columnar) und nach der
+    Aufbewahrungsrichtlinie gelöscht.
+
+    Mit index=True (ohne SQLite-Speicher) wird beim Schreiben ein
+    invertierter Index der Nachrichten gepflegt (siehe app.postings): für
+    das aktive Segment im Speicher, beim Schließen als <Segment>.idx neben
+    dem Segment. Die Volltextsuche liest dann nur die Treffer.
+
+    append/rotate laufen nur im Writer-Thread; Abfragen und Wartung dürfen
+    parallel laufen und synchronisieren sich über _lock.
+    """
+    def __init__(self, log_dir: str, log_file: str, max_bytes: int, max_age: float,
+                 durability: str = "flush", compress: bool = True, segment_format: str = "jsonl",
+                 index: bool = False):
+        if segment_format not in SEGMENT_FORMATS:
+            raise ValueError(f"Unbekanntes Segment-Format: {segment_format}")
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, log_file)
+        self.segment_dir = os.path.join(log_dir, "segments")
+        self.stem = os.path.splitext(log_file)[0]
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.durability = durability
+        self.compress_segments = compress
+        self.segment_format = segment_format
+        self.index = index
+        # Token -> Byte-Offsets der Zeilen im aktiven Segment
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._seq = 0
+        # Zeitgrenzen des aktiven Segments; nachgelieferte Einträge sind nicht zeitlich geordnet
+        self._first_ts: Optional[float] = None
+        self._last_ts: Optional[float] = None
+        # Bezugspunkt für max_age: jüngster Eintrag des ersten Batches im Segment
+        self._opened_ts: Optional[float] = None
+
+    def open(self):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        closed = self.segments()
+        self._seq = closed[0].seq + 1 if closed else 1
+        self._opened_ts, self._first_ts, self._last_ts = self._recover_bounds()
+        self._file = open(self.path, mode='ab')
+        self._size = self._file.tell()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _recover_bounds(self) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        # Erster Zeitstempel und Zeitgrenzen des aktiven Segments nach einem Neustart;
+        # wegen nachgelieferter Einträge muss das ganze Segment gelesen werden (dabei
+        # wird auch sein Index neu aufgebaut)
+        opened_ts = first_ts = last_ts = None
+        self._postings = {}
+        if not os.path.exists(self.path):
+            return opened_ts, first_ts, last_ts
+        with open(self.path, mode='rb') as file:
+            offset = 0
+            for line in file:
+                if self.index:
+                    add_postings(self._postings, offset, line.decode('utf-8', errors='replace'))
+                offset += len(line)
+                ts = _line_timestamp(line)
+                if ts is None:
+                    continue
+                if opened_ts is None:
+                    opened_ts = first_ts = last_ts = ts
+                first_ts, last_ts = min(first_ts, ts), max(last_ts, ts)
+        return opened_ts, first_ts, last_ts
+
+    def append(self, lines: List[str], first_ts: float, last_ts: float) -> bool:
+        """
+        Hängt einen Batch an das aktive Segment an; rotiert vorher, falls nötig.
+        :return: True, wenn dabei ein Segment geschlossen wurde
+        """
+        rotated = False
+        if self._opened_ts is not None and (
+                self._size >= self.max_bytes or
+                (self.max_age > 0 and last_ts - self._opened_ts >= self.max_age)):
+            self.rotate()
+            rotated = True
+        data = "".join(line + "\n" for line in lines).encode('utf-8')
+        self._file.write(data)
+        self._file.flush()
+        if self.durability == "fsync":
+            os.fsync(self._file.fileno())
+        if self.index:
+            # Erst nach dem Schreiben eintragen, damit die Suche nur vollständige Zeilen liest
+            offset = self._size
+            with self._lock:
+                for line in lines:
+                    add_postings(self._postings, offset, line)
+                    offset += len(line.encode('utf-8')) + 1
+        self._size += len(data)
+        if self._opened_ts is None:
+            self._opened_ts = last_ts
+        self._first_ts = min(self._first_ts or first_ts, first_ts)
+        self._last_ts = max(self._last_ts or last_ts, last_ts)
+        return rotated
+
+    def rotate(self):
+        """Schließt das aktive Segment und beginnt ein neues."""
+        with self._lock:
+            if self._first_ts is None:
+                return
+            self._file.close()
+            name = f"{self.stem}.{self._seq:08d}.{int(self._first_ts * 1000)}-{int(self._last_ts * 1000)}.log"
+            path = os.path.join(self.segment_dir, name)
+            os.replace(self.path, path)
+            if self.index:
+                write_index(_index_path(path), self._postings)
+                self._postings = {}
+            self._seq += 1
+            self._opened_ts = self._first_ts = self._last_ts = None
+            self._file = open(self.path, mode='ab')
+            self._size = 0
+
+    def segments(self) -> List[Segment]:
+        """Geschlossene Segmente, neueste zuerst."""
+        segments = {}
+        try:
+            names = os.listdir(self.segment_dir)
+        except FileNotFoundError:
+            return []
+        for name in names:
+            match = _SEGMENT_PATTERN.match(name)
+            if not match or match.group("stem") != self.stem:
+                continue
+            seq = int(match.group("seq"))
+            compressed = match.group("gz") is not None
+            columnar = match.group("col") is not None
+            # Während der Komprimierung/Konvertierung existieren kurz beide Dateien; die unkomprimierte gilt
+            if seq in segments and not segments[seq].compressed and not segments[seq].columnar:
+                continue
+            segments[seq] = Segment(seq, int(match.group("first")) / 1000.0, int(match.group("last")) / 1000.0,
+                                    os.path.join(self.segment_dir, name), compressed, columnar)
+        return sorted(segments.values(), reverse=True)
+
+    def compress_pending(self):
+        """
+        Komprimiert alle noch unkomprimierten geschlossenen Segmente bzw.
+        konvertiert sie (auch bereits komprimierte) ins spaltenorientierte Format.
+        """
+        if self.segment_format == "columnar":
+            from .columnar import ColumnarSegment, convert_jsonl
+            for segment in self.segments():
+                if segment.columnar:
+                    continue
+                col_path = _columnar_path(segment.path)
+                convert_jsonl(segment.path, col_path)
+                if self.index:
+                    # Die Konvertierung sortiert nach Zeitstempel: Index über die Zeilennummern neu aufbauen
+                    with ColumnarSegment(col_path) as reader:
+                        postings: Dict[str, List[int]] = {}
+                        for row in range(len(reader)):
+                            add_postings(postings, row, reader.line(row).decode('utf-8', errors='replace'))
+                    write_index(_index_path(col_path), postings)
+                with self._lock:
+                    os.remove(segment.path)
+                    _remove_index(segment.path)
+            return
+        if not self.compress_segments:
+            return
+        for segment in self.segments():
+            if segment.compressed:
+                continue
+            tmp_path = segment.path + ".gz.tmp"
+            with open(segment.path, mode='rb') as src, gzip.open(tmp_path, mode='wb') as dst:
+                shutil.copyfileobj(src, dst)
+            with self._lock:
+                os.replace(tmp_path, segment.path + ".gz")
+                os.remove(segment.path)
+
+    def enforce_retention(self, max_age: float, max_bytes: int) -> int:
+        """
+        Löscht geschlossene Segmente, deren letzter Eintrag älter als max_age
+        Sekunden ist, und danach die ältesten, bis alle Segmente zusammen
+        höchstens max_bytes belegen (0 = keine Grenze).
+        :return: Anzahl gelöschter Segmente
+        """
+        removed = 0
+        segments = self.segments()
+        total = sum(os.path.getsize(s.path) for s in segments) + self._size
+        cutoff = time.time() - max_age if max_age > 0 else None
+        for segment in reversed(segments):  # älteste zuerst
+            expired = cutoff is not None and segment.last_ts < cutoff
+            over_budget = max_bytes > 0 and total > max_bytes
+            if not (expired or over_budget):
+                continue  # nachgelieferte Einträge: ältere Segmente sind nicht zwingend früher abgelaufen
+            size = os.path.getsize(segment.path)
+            with self._lock:
+                os.remove(segment.path)
+                _remove_index(segment.path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for segment in self.segments():
+                try:
+                    os.remove(segment.path)
+                except FileNotFoundError:
+                    pass
+                _remove_index(segment.path)
+            self._file.truncate(0)
+            self._size = 0
+            self._postings = {}
+            self._opened_ts = self._first_ts = self._last_ts = None
+
+    def rebuild_stats(self, stats) -> int:
+        """
+        Zählt alle Segmente (älteste zuerst) in 'stats' (LogStatistics) ein, z.B.
+        wenn stats.json fehlt. Spaltenorientierte Segmente werden nur über ihre
+        ts- und id-Spalten gezählt (ColumnarSegment.aggregate), ohne Latenzen;
+        JSONL-Segmente werden Zeile für Zeile dekodiert.
+        :return: Anzahl eingezählter Einträge
+        """
+        from .columnar import ColumnarSegment
+        with self._lock:
+            candidates = list(reversed(self.segments()))
+            if self._first_ts is not None:
+                candidates.append(Segment(self._seq, self._first_ts, self._last_ts, self.path, False))
+        widths = [ring.width for ring in stats.rings.values()]
+        total = 0
+        for segment in candidates:
+            try:
+                if segment.columnar:
+                    with ColumnarSegment(segment.path) as reader:
+                        counts = reader.aggregate()
+                        buckets = {width: reader.aggregate_buckets(width) for width in widths}
+                    stats.add_aggregate(counts, buckets, counts["last_ts"])
+                    total += counts["total"]
+                    continue
+                opener = gzip.open if segment.compressed else open
+                with opener(segment.path, mode='rb') as file:
+                    for line in file:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        stats.add(entry, entry_timestamp(entry))
+                        total += 1
+            except FileNotFoundError:
+                # Zwischenzeitlich komprimiert, konvertiert oder gelöscht
+                continue
+        return total
+
+    def scan(self, limit: int, filters: Dict[str, Optional[str]], since_ts: Optional[float],
+             until_ts: Optional[float], cursor: Optional[str],
+             tokens: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Liefert bis zu 'limit' passende Einträge (neueste zuerst) über alle
+        Segmente und den Cursor der nächsten Seite ('<Sequenz>:<Byte-Offset>',
+        bei spaltenorientierten Segmenten '<Sequenz>:<Zeilennummer>').
+        Segmente außerhalb von [since_ts, until_ts) werden nicht geöffnet.
+        Mit 'tokens' nur Zeilen, die alle Suchtokens enthalten; mit Index
+        werden nur die Treffer gelesen, Segmente ohne Index (z.B. vor dem
+        Einschalten geschrieben) werden gescannt.
+        """
+        start_seq, start_offset = _parse_cursor(cursor)
+        with self._lock:
+            # Aktives Segment unter dem Lock öffnen, damit eine Rotation dazwischen nichts verschluckt
+            candidates = []
+            if self._first_ts is not None:
+                positions = None
+                if tokens and self.index:
+                    positions = match_postings([self._postings.get(token, ()) for token in tokens])
+                candidates.append((Segment(self._seq, self._first_ts, self._last_ts, self.path, False),
+                                   open(self.path, mode='rb'), positions))
+            for segment in self.segments():
+                candidates.append((segment, None, None))
+
+        logs = []
+        try:
+            for segment, file, positions in candidates:
+                if start_seq is not None and segment.seq > start_seq:
+                    continue
+                if until_ts is not None and segment.first_ts >= until_ts:
+                    continue
+                if since_ts is not None and segment.last_ts < since_ts:
+                    # Kein break: ein Segment aus nachgelieferten Einträgen kann vor Segmenten
+                    # mit neueren Einträgen liegen
+                    continue
+                end = start_offset if segment.seq == start_seq else None
+                matches = self._scan_segment(segment, file, end, limit - len(logs) + 1,
+                                             filters, since_ts, until_ts, tokens, positions)
+                for offset, length, entry in matches:
+                    if len(logs) >= limit:
+                        return logs, f"{segment.seq}:{offset + length + 1}"
+                    logs.append(entry)
+        finally:
+            for _, file, _ in candidates:
+                if file is not None:
+                    file.close()
+        return logs, None
+
+    def _scan_segment(self, segment: Segment, file, end: Optional[int], need: int,
+                      filters: Dict[str, Optional[str]], since_ts: Optional[float],
+                      until_ts: Optional[float], tokens: Optional[List[str]] = None,
+                      positions: Optional[List[int]] = None) -> List[Tuple[int, int, Dict[str, Any]]]:
+        wanted = set(tokens or ())
+        if segment.columnar:
+            return self._scan_columnar(segment, end, need, filters, since_ts, until_ts, wanted)
+
+        matches = []
+        owned = False
+        if not segment.compressed and file is None:
+            try:
+                file = open(segment.path, mode='rb')
+                owned = True
+            except FileNotFoundError:
+                # Zwischen Auflisten und Öffnen komprimiert oder konvertiert
+                if self.segment_format == "columnar":
+                    return self._scan_columnar(segment._replace(path=_columnar_path(segment.path), columnar=True),
+                                               end, need, filters, since_ts, until_ts, wanted)
+                segment = segment._replace(path=segment.path + ".gz", compressed=True)
+        if wanted and self.index and positions is None:
+            positions = load_match(_index_path(segment.path), wanted)
+        if positions is not None:
+            # Laut Index enthalten genau diese Zeilen alle Tokens
+            wanted = set()
+
+        def parse(line):
+            if not line.strip():
+                return None
+            if wanted and not wanted <= tokenize_line(line.decode("utf-8", errors="replace")):
+                return None
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Fehler beim Dekodieren der Log-Zeile: {line!r}")
+                return None
+            if any(value and entry.get(name) != value for name, value in filters.items()):
+                return None
+            if since_ts is not None or until_ts is not None:
+                ts = entry_timestamp(entry)
+                # nachgelieferte Einträge: Segment nicht zeitlich geordnet
+                if (since_ts is not None and ts < since_ts) or (until_ts is not None and ts >= until_ts):
+                    return None
+            return entry
+
+        if not segment.compressed:
+            try:
+                if positions is not None:
+                    lines = _lines_at(file, reversed(positions), end)
+                else:
+                    lines = read_lines_reversed(file, end=end)
+                for offset, line in lines:
+                    entry = parse(line)
+                    if entry is None:
+                        continue
+                    matches.append((offset, len(line), entry))
+                    if len(matches) >= need:
+                        break
+            finally:
+                if owned:
+                    file.close()
+            return matches
+
+        # gzip ist nicht rückwärts lesbar: vorwärts lesen und die neuesten 'need' Treffer behalten
+        newest = deque(maxlen=need)
+        try:
+            with gzip.open(segment.path, mode='rb') as gz:
+                # Mit Index springt seek() zu den Treffern (dekomprimiert nur bis zum letzten)
+                lines = _lines_at(gz, positions, end) if positions is not None else _lines_forward(gz, end)
+                for offset, line in lines:
+                    entry = parse(line)
+                    if entry is not None:
+                        newest.append((offset, len(line), entry))
+        except FileNotFoundError:
+            # Zwischenzeitlich durch die Aufbewahrungsrichtlinie gelöscht
+            pass
+        return list(reversed(newest))
+
+    def _scan_columnar(self, segment: Segment, end: Optional[int], need: int,
+                       filters: Dict[str, Optional[str]], since_ts: Optional[float],
+                       until_ts: Optional[float], wanted: set) -> List[Tuple[int, int, Dict[str, Any]]]:
+        # Zeitraum und Filter laufen über die Spalten; Offsets sind hier Zeilennummern
+        from .columnar import ColumnarSegment
+        try:
+            reader = ColumnarSegment(segment.path)
+        except FileNotFoundError:
+            # Zwischenzeitlich durch die Aufbewahrungsrichtlinie gelöscht
+            return []
+        positions = load_match(_index_path(segment.path), wanted) if wanted and self.index else None
+        matches = []
+        with reader:
+            if positions is not None:
+                # Nur die Treffer aus dem Index prüfen, neueste zuerst
+                for index in reversed(positions):
+                    if end is not None and index >= end:
+                        continue
+                    ts = reader.ts[index]
+                    if (since_ts is not None and ts < since_ts) or (until_ts is not None and ts >= until_ts):
+                        continue
+                    entry = reader.entry(index)
+                    if any(value and entry.get(name) != value for name, value in filters.items()):
+                        continue
+                    matches.append((index, 0, entry))
+                    if len(matches) >= need:
+                        break
+                return matches
+            extra = {name: value for name, value in filters.items() if value and name not in reader.columns}
+            for index in reader.select(filters, since_ts, until_ts, end):
+                if wanted or extra:
+                    line = reader.line(index)
+                    if wanted and not wanted <= tokenize_line(line.decode("utf-8", errors="replace")):
+                        continue
+                    entry = json.loads(line)
+                    if any(entry.get(name) != value for name, value in extra.items()):
+                        continue
+                else:
+                    entry = reader.entry(index)
+                matches.append((index, 0, entry))
+                if len(matches) >= need:
+                    break
+        return matches
+
+
+def _columnar_path(path: str) -> str:
+    # x.00000001.<first>-<last>.log[.gz] -> x.00000001.<first>-<last>.col
+    return path[:path.rindex(".log")] + ".col"
+
+
+def _index_path(path: str) -> str:
+    # x.00000001.<first>-<last>.log[.gz] -> .log.idx (Byte-Offsets, gelten auch nach gzip),
+    # .col -> .col.idx (Zeilennummern)
+    return (path[:-3] if path.endswith(".gz") else path) + ".idx"
+
+
+def _remove_index(path: str):
+    try:
+        os.remove(_index_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _parse_cursor(cursor: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    if cursor is None:
+        return None, None
+    seq, sep, offset = cursor.partition(":")
+    if not sep or not seq.isdigit() or not offset.isdigit():
+        raise ValueError(f"Ungültiger Cursor: {cursor}")
+    return int(seq), int(offset)
+
+
+def _line_timestamp(line: bytes) -> Optional[float]:
+    try:
+        return entry_timestamp(json.loads(line))
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+def _lines_at(file, positions, end: Optional[int] = None):
+    """(Offset, Zeile) der Zeilen, die an den Byte-Offsets 'positions' beginnen (nur unterhalb von 'end')."""
+    for position in positions:
+        if end is not None and position >= end:
+            continue
+        file.seek(position)
+        yield position, file.readline().rstrip(b"\n")
+
+
+def _lines_forward(file, end: Optional[int] = None):
+    """(Offset, Zeile) vom Anfang bis vor 'end'."""
+    offset = 0
+    for raw in file:
+        line = raw.rstrip(b"\n")
+        if end is not None and offset + len(line) >= end:
+            break
+        yield offset, line
+        offset += len(raw)
+
+
+def read_lines_reversed(file, chunk_size: int = READ_CHUNK_SIZE, end: Optional[int] = None):
+    """
+    Liefert (Offset, Zeile) einer binär geöffneten Datei vom Ende (oder von
+    Byte-Offset 'end') zum Anfang. Liest blockweise rückwärts; eine am
+    Blockanfang abgeschnittene Zeile wird mit dem davor liegenden Block
+    zusammengesetzt. Aufwand O(gelesene Zeilen).
+    """
+    if end is None:
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+    position = end
+    remainder = b""
+    while position > 0:
+        read_size = min(chunk_size, position)
+        position -= read_size
+        file.seek(position)
+        chunk = file.read(read_size) + remainder
+        lines = chunk.split(b"\n")
+        # Die erste Zeile kann im vorherigen Block beginnen
+        remainder = lines[0]
+        offset = position + len(chunk)
+        for line in reversed(lines[1:]):
+            offset -= len(line) + 1
+            if line:
+                yield offset + 1, line
+    if remainder:
+        yield 0, remainder
@@ -0,0 +1,264 @@
+import os
+import json
+import math
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from . import latency
+
+# Feld des Log-Eintrags -> Schlüssel in der Statistik
+DIMENSIONS = {
+    "source_system": "by_source",
+    "target_system": "by_target",
+    "interaction_type": "by_type",
+    "status": "by_status",
+}
+
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+# Felder einer Kante im Latenz-Histogramm, Schlüssel ist "quelle|ziel|typ"
+EDGE_FIELDS = ("source_system", "target_system", "interaction_type")
+
+
+def _empty_counts() -> Dict[str, Any]:
+    counts = {"total": 0, "latency": {}}
+    for key in DIMENSIONS.values():
+        counts[key] = {}
+    return counts
+
+
+def _add_counts(target: Dict[str, Any], source: Dict[str, Any]):
+    target["total"] += source["total"]
+    for key in DIMENSIONS.values():
+        bucket = target[key]
+        for value, count in source[key].items():
+            bucket[value] = bucket.get(value, 0) + count
+
+
+class _Ring:
+    """
+    Feste Anzahl Zeit-Buckets der Breite 'width' Sekunden. Der Slot eines
+    Zeitpunkts ist (ts // width) % size; ein Slot mit älterem Start wird beim
+    ersten neueren Eintrag überschrieben, Einträge älter als der Ring fallen heraus.
+    """
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self.slots: List[Optional[Dict[str, Any]]] = [None] * size
+
+    def bucket_for(self, ts: float) -> Optional[Dict[str, Any]]:
+        start = int(ts // self.width) * self.width
+        index = (start // self.width) % self.size
+        bucket = self.slots[index]
+        if bucket is None or bucket["start"] < start:
+            bucket = _empty_counts()
+            bucket["start"] = start
+            self.slots[index] = bucket
+        elif bucket["start"] > start:
+            return None  # älter als der Ring
+        return bucket
+
+    def window(self, since: float, until: float) -> List[Dict[str, Any]]:
+        """Buckets, die [since, until) überschneiden, aufsteigend; O(Anzahl Buckets)."""
+        first = int(since // self.width)
+        last = int((until - 1e-9) // self.width)
+        first = max(first, last - self.size + 1)
+        buckets = []
+        for slot in range(first, last + 1):
+            bucket = self.slots[slot % self.size]
+            if bucket is not None and bucket["start"] == slot * self.width:
+                buckets.append(bucket)
+        return buckets
+
+    def dump(self) -> List[Dict[str, Any]]:
+        return [bucket for bucket in self.slots if bucket is not None]
+
+    def load(self, buckets: List[Dict[str, Any]]):
+        for bucket in buckets:
+            index = (bucket["start"] // self.width) % self.size
+            current = self.slots[index]
+            if current is None or current["start"] < bucket["start"]:
+                self.slots[index] = bucket
+
+
+class LogStatistics:
+    """
+    Beim Schreiben inkrementell gepflegte Zähler nach Quelle, Ziel, Typ und
+    Status: exakte Gesamtsummen sowie Zeitreihen in Minuten- und
+    Stunden-Buckets (Ringe fester Größe). Einträge mit duration_ms fließen
+    zusätzlich in ein Latenz-Histogramm pro Kante (Quelle, Ziel, Typ) und
+    Bucket; für einen Zeitraum werden die Histogramme zusammengeführt. Wird periodisch als JSON
+    gespeichert und beim Start geladen; Abfragen lesen nie die Log-Dateien.
+    Nur aus dem Event-Loop benutzen.
+    """
+    def __init__(self, path: str, minute_buckets: int = 24 * 60, hour_buckets: int = 90 * 24):
+        self.path = path
+        self.totals = _empty_counts()
+        self.latest_timestamp: Optional[str] = None
+        self.rings = {
+            "minute": _Ring(RESOLUTIONS["minute"], minute_buckets),
+            "hour": _Ring(RESOLUTIONS["hour"], hour_buckets),
+        }
+        self.dirty = False
+
+    def add(self, entry: Dict[str, Any], ts: float):
+        buckets = [self.totals] + [ring.bucket_for(ts) for ring in self.rings.values()]
+        duration = entry.get("duration_ms")
+        if isinstance(duration, (int, float)) and not isinstance(duration, bool) \
+                and duration >= 0 and math.isfinite(duration):
+            edge = "|".join(str(entry.get(field, "unknown")) for field in EDGE_FIELDS)
+            duration_key = latency.bin_key(duration)
+        else:
+            edge = None
+        for bucket in buckets:
+            if bucket is None:
+                continue
+            bucket["total"] += 1
+            for field, key in DIMENSIONS.items():
+                value = str(entry.get(field, "unknown"))
+                counts = bucket[key]
+                counts[value] = counts.get(value, 0) + 1
+            if edge is not None:
+                histograms = bucket.setdefault("latency", {})
+                if edge not in histograms:
+                    histograms[edge] = latency.empty_histogram()
+                latency.record(histograms[edge], duration, duration_key)
+        timestamp = entry.get("timestamp")
+        if timestamp and (self.latest_timestamp is None or timestamp > self.latest_timestamp):
+            self.latest_timestamp = timestamp
+        self.dirty = True
+
+    def summary(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ohne Zeitraum: exakte Gesamtsummen. Mit since/until: Summen und
+        Zeitreihe über die Buckets des Zeitraums (auf Bucket-Grenzen gerundet).
+        Ohne resolution werden Minuten-Buckets genutzt, solange der Zeitraum
+        im Minuten-Ring liegt, sonst Stunden-Buckets.
+        """
+        if since is None and until is None and resolution is None:
+            result = {key: json.loads(json.dumps(value)) for key, value in self.totals.items() if key != "latency"}
+            result["total_interactions"] = result.pop("total")
+            result["latest_timestamp"] = self.latest_timestamp
+            return result
+
+        resolution, buckets = self._window(since, until, resolution)
+        result = _empty_counts()
+        series = []
+        for bucket in buckets:
+            _add_counts(result, bucket)
+            series.append({
+                "start": datetime.fromtimestamp(bucket["start"]).isoformat(),
+                "total": bucket["total"],
+                "by_status": dict(bucket["by_status"]),
+            })
+        del result["latency"]
+        result["total_interactions"] = result.pop("total")
+        result["latest_timestamp"] = self.latest_timestamp
+        result["resolution"] = resolution
+        result["series"] = series
+        return result
+
+    def latency(self, quantiles: List[float], filters: Dict[str, Optional[str]],
+                since: Optional[datetime] = None, until: Optional[datetime] = None,
+                resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Latenz-Perzentile pro Kante (Quelle, Ziel, Typ), passend zu den Filtern.
+        Ohne Zeitraum über alle erfassten Dauern, sonst über die zusammengeführten
+        Histogramme der Buckets des Zeitraums (Auflösung wie bei summary).
+        """
+        if since is None and until is None and resolution is None:
+            sources = [self.totals]
+        else:
+            resolution, sources = self._window(since, until, resolution)
+        merged: Dict[str, Dict[str, Any]] = {}
+        for bucket in sources:
+            for edge, histogram in bucket.get("latency", {}).items():
+                if edge not in merged:
+                    merged[edge] = latency.empty_histogram()
+                latency.merge(merged[edge], histogram)
+
+        edges = []
+        for edge, histogram in sorted(merged.items()):
+            values = dict(zip(EDGE_FIELDS, edge.split("|", 2)))
+            if any(value and values.get(name) != value for name, value in filters.items()):
+                continue
+            values.update(latency.summarize(histogram, quantiles))
+            edges.append(values)
+        result = {"edges": edges}
+        if resolution is not None:
+            result["resolution"] = resolution
+        return result
+
+    def _window(self, since: Optional[datetime], until: Optional[datetime],
+                resolution: Optional[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Auflösung und Buckets für einen Zeitraum; ohne Auflösung Minuten, solange sie reichen."""
+        until_ts = until.timestamp() if until else time.time() + 1
+        if resolution is None:
+            minute_ring = self.rings["minute"]
+            minute_span = minute_ring.width * minute_ring.size
+            resolution = "minute" if since is None or since.timestamp() >= time.time() - minute_span else "hour"
+        if resolution not in self.rings:
+            raise ValueError(f"Unbekannte Auflösung: {resolution}")
+        ring = self.rings[resolution]
+        since_ts = since.timestamp() if since else until_ts - ring.width * ring.size
+        return resolution, ring.window(since_ts, until_ts)
+
+    def add_aggregate(self, totals: Dict[str, Any], buckets: Dict[int, List[Tuple[int, Dict[str, Any]]]],
+                      last_ts: Optional[float]):
+        """
+        Zählt vorab aggregierte Einträge ein (ColumnarSegment.aggregate bzw.
+        aggregate_buckets je Bucket-Breite eines Rings). Ohne Latenzen, die
+        Aggregate enthalten keine Dauern.
+        """
+        _add_counts(self.totals, totals)
+        for ring in self.rings.values():
+            for start, counts in buckets.get(ring.width, ()):
+                bucket = ring.bucket_for(start)
+                if bucket is not None:
+                    _add_counts(bucket, counts)
+        if last_ts is not None:
+            timestamp = datetime.fromtimestamp(last_ts).isoformat()
+            if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+                self.latest_timestamp = timestamp
+        self.dirty = True
+
+    def clear(self):
+        self.totals = _empty_counts()
+        self.latest_timestamp = None
+        for ring in self.rings.values():
+            ring.slots = [None] * ring.size
+        self.dirty = True
+
+    def dump(self) -> str:
+        self.dirty = False
+        return json.dumps({
+            "totals": self.totals,
+            "latest_timestamp": self.latest_timestamp,
+            "rings": {name: ring.dump() for name, ring in self.rings.items()},
+        })
+
+    def save(self, data: str):
+        """Schreibt einen dump() atomar (im Thread-Pool aufrufbar)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """:return: False, wenn keine lesbare Statistik-Datei existiert"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Fehler beim Laden der Statistik: {str(e)}")
+            return False
+        self.totals = data.get("totals") or _empty_counts()
+        self.latest_timestamp = data.get("latest_timestamp")
+        for name, buckets in data.get("rings", {}).items():
+            if name in self.rings:
+                self.rings[name].load(buckets)
+        return True
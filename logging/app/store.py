@@ -0,0 +1,216 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from .search import tokenize_line
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    source_system TEXT NOT NULL,
+    target_system TEXT NOT NULL,
+    interaction_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_ts ON entries (ts);
+CREATE INDEX IF NOT EXISTS ix_entries_source ON entries (source_system, id);
+CREATE INDEX IF NOT EXISTS ix_entries_target ON entries (target_system, id);
+CREATE INDEX IF NOT EXISTS ix_entries_type ON entries (interaction_type, id);
+CREATE INDEX IF NOT EXISTS ix_entries_status ON entries (status, id);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (token, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_postings_entry ON postings (entry_id);
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (trace_id, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_traces_entry ON traces (entry_id);
+"""
+
+# Filter-Parameter -> indizierte Spalte
+_FILTER_COLUMNS = {
+    "source_system": "source_system",
+    "target_system": "target_system",
+    "interaction_type": "interaction_type",
+    "status": "status",
+}
+
+
+class SQLiteLogStore:
+    """
+    Indizierter Log-Speicher auf Basis einer eingebetteten SQLite-Datenbank.
+    Jeder Eintrag wird als JSON-Text plus indizierten Spalten für die Filter
+    und den Zeitstempel gespeichert. Die fortlaufende id dient als Cursor:
+    Seiten werden absteigend nach id gelesen (neueste zuerst).
+
+    Dazu kommt ein invertierter Index (Token -> Eintrags-ids) über Schlüssel
+    und Werte der Nachrichten, der in derselben Transaktion wie die Einträge
+    geschrieben wird. Eine Suche liest die Posting-Liste eines Tokens
+    absteigend nach id, ihr Aufwand wächst also mit den Treffern, nicht mit
+    der Größe des Logs. Einträge mit trace_id sind zusätzlich über die
+    Tabelle traces auffindbar.
+
+    Geschrieben wird nur vom Writer des AsyncLogger (ein Batch pro
+    Transaktion); Abfragen öffnen eigene Verbindungen und laufen dank WAL
+    parallel zum Schreiben.
+    """
+    def __init__(self, db_path: str, durability: str = "flush"):
+        self.db_path = db_path
+        self.durability = durability
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: nach Absturz des Prozesses konsistent, fsync nur beim Checkpoint
+        conn.execute("PRAGMA synchronous=" + ("FULL" if self.durability == "fsync" else "NORMAL"))
+        conn.executescript(_SCHEMA)
+        # ids werden selbst vergeben, damit die Postings im selben Batch darauf verweisen können
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'entries'").fetchone()
+        self._next_id = (row[0] if row else 0) + 1
+        self._write_conn = conn
+
+    def close(self):
+        if self._write_conn is not None:
+            self._write_conn.close()
+            self._write_conn = None
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def write_batch(self, entries: List[Tuple[float, Dict[str, Any], str]]):
+        """Schreibt (ts, Eintrag, JSON-Zeile) samt Volltext-Postings und Trace-Index in einer Transaktion."""
+        rows, postings, traces = [], [], []
+        entry_id = self._next_id
+        for ts, entry, line in entries:
+            rows.append((entry_id, ts, entry.get("source_system", "unknown"), entry.get("target_system", "unknown"),
+                         entry.get("interaction_type", "unknown"), entry.get("status", "unknown"), line))
+            postings.extend((token, entry_id) for token in tokenize_line(line))
+            if entry.get("trace_id"):
+                traces.append((entry["trace_id"], entry_id))
+            entry_id += 1
+        with self._lock:
+            conn = self._write_conn
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO entries (id, ts, source_system, target_system, interaction_type, status, entry) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT OR IGNORE INTO postings (token, entry_id) VALUES (?, ?)", postings)
+                conn.executemany("INSERT INTO traces (trace_id, entry_id) VALUES (?, ?)", traces)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._next_id = entry_id
+
+    def query(self, limit: int, filters: Dict[str, Optional[str]], since: Optional[float] = None,
+              until: Optional[float] = None, cursor: Optional[str] = None,
+              tokens: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Liefert bis zu 'limit' Einträge (neueste zuerst) und den Cursor der
+        nächsten Seite, oder None, wenn keine weiteren Einträge existieren.
+        Mit 'tokens' nur Einträge, deren Nachricht alle Tokens enthält.
+        """
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value:
+                clauses.append(f"e.{_FILTER_COLUMNS[name]} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("e.ts < ?")
+            params.append(until)
+        if tokens:
+            # Das längste Token ist meist das seltenste: seine Posting-Liste treibt die Abfrage
+            driver, *others = sorted(tokens, key=len, reverse=True)
+            for token in others:
+                clauses.append("EXISTS (SELECT 1 FROM postings o WHERE o.token = ? AND o.entry_id = p.entry_id)")
+                params.append(token)
+            if cursor:
+                clauses.append("p.entry_id < ?")
+                params.append(int(cursor))
+            where = " AND ".join(["p.token = ?"] + clauses)
+            params.insert(0, driver)
+            sql = (f"SELECT e.id, e.entry FROM postings p JOIN entries e ON e.id = p.entry_id "
+                   f"WHERE {where} ORDER BY p.entry_id DESC LIMIT ?")
+        else:
+            if cursor:
+                clauses.append("e.id < ?")
+                params.append(int(cursor))
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            sql = f"SELECT e.id, e.entry FROM entries e {where} ORDER BY e.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        conn = self._connect_reader()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        logs = []
+        for _, entry in rows[:limit]:
+            try:
+                logs.append(json.loads(entry))
+            except json.JSONDecodeError:
+                print(f"Fehler beim Dekodieren des Log-Eintrags: {entry!r}")
+        return logs, next_cursor
+
+    def trace(self, trace_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Bis zu 'limit' Einträge eines Traces in Schreibreihenfolge (älteste zuerst)."""
+        conn = self._connect_reader()
+        try:
+            rows = conn.execute(
+                "SELECT e.entry FROM traces t JOIN entries e ON e.id = t.entry_id "
+                "WHERE t.trace_id = ? ORDER BY t.entry_id LIMIT ?", (trace_id, limit)).fetchall()
+        finally:
+            conn.close()
+        logs = []
+        for (entry,) in rows:
+            try:
+                logs.append(json.loads(entry))
+            except json.JSONDecodeError:
+                print(f"Fehler beim Dekodieren des Log-Eintrags: {entry!r}")
+        return logs
+
+    def delete_before(self, cutoff: float, chunk: int = 10000) -> int:
+        """Löscht Einträge älter als cutoff (Epoch-Sekunden) in kleinen Transaktionen."""
+        deleted = 0
+        while True:
+            with self._lock:
+                conn = self._write_conn
+                ids = [(row[0],) for row in conn.execute(
+                    "SELECT id FROM entries WHERE ts < ? LIMIT ?", (cutoff, chunk))]
+                if ids:
+                    conn.execute("BEGIN")
+                    try:
+                        conn.executemany("DELETE FROM postings WHERE entry_id = ?", ids)
+                        conn.executemany("DELETE FROM traces WHERE entry_id = ?", ids)
+                        conn.executemany("DELETE FROM entries WHERE id = ?", ids)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+            deleted += len(ids)
+            if len(ids) < chunk:
+                return deleted
+
+    def clear(self):
+        with self._lock:
+            self._write_conn.execute("DELETE FROM postings")
+            self._write_conn.execute("DELETE FROM traces")
+            self._write_conn.execute("DELETE FROM entries")
+
@@ -0,0 +1,40 @@
+from typing import Dict, Any, List
+
+from .segments import entry_timestamp
+
+# Max. Einträge, die für einen Trace geladen werden
+TRACE_MAX_ENTRIES = 1000
+
+
+def build_trace_timeline(trace_id: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Zeitleiste eines Traces: die Einträge als Hops nach Zeitstempel sortiert,
+    jeweils mit Abstand zum ersten Hop (offset_ms) und zum vorherigen Hop
+    (duration_ms), sowie die Gesamtdauer vom ersten bis zum letzten Hop.
+    Zeitstempel sind die der Clients beim Erzeugen des Eintrags (ohne einen
+    solchen die Eingangszeit im Logging-Service).
+    """
+    timed = sorted(((entry_timestamp(entry), entry) for entry in entries), key=lambda item: item[0])
+    hops = []
+    first_ts = previous_ts = timed[0][0] if timed else 0.0
+    for ts, entry in timed:
+        hop = {
+            "timestamp": entry.get("timestamp"),
+            "source_system": entry.get("source_system"),
+            "target_system": entry.get("target_system"),
+            "interaction_type": entry.get("interaction_type"),
+            "status": entry.get("status"),
+            "offset_ms": round((ts - first_ts) * 1000, 3),
+            "duration_ms": round((ts - previous_ts) * 1000, 3),
+        }
+        if entry.get("error_message"):
+            hop["error_message"] = entry["error_message"]
+        hops.append(hop)
+        previous_ts = ts
+    return {
+        "trace_id": trace_id,
+        "started_at": hops[0]["timestamp"] if hops else None,
+        "finished_at": hops[-1]["timestamp"] if hops else None,
+        "duration_ms": hops[-1]["offset_ms"] if hops else 0.0,
+        "hops": hops,
+    }
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from app.logger import build_log_entry, build_log_line
+from app.search import tokenize_line
+from app.segments import SegmentedLogFile
+
+
+def test_tokenize_line_indexes_only_the_message():
+    entry = build_log_entry("crm", "erp", "order", {"order_id": "ORD-42", "note": 'quoted "}, tail'},
+                            "error", "stock exhausted", "trace-abc", 12.5)
+    tokens = tokenize_line(json.dumps(entry))
+    assert {"order_id", "ord-42", "note", "quoted", "tail"} <= tokens
+    assert not tokens & {"error", "stock", "exhausted", "trace-abc", "12.5", "crm", "erp"}
+
+    envelope = build_log_entry("crm", "erp", "order", None, "success", None, "trace-abc", 3.0)
+    tokens = tokenize_line(build_log_line(envelope, b'{"kunde":"M\\u00fcller","items":[{"sku":"A-1"}]}'))
+    assert tokens == {"kunde", "müller", "items", "sku", "a-1"}
+
+
+def _line(ts, order_id):
+    return json.dumps(build_log_entry("crm", "erp", "order", {"order_id": order_id},
+                                      timestamp=datetime.fromtimestamp(ts)))
+
+
+def _search(log, tokens, limit=100):
+    results, cursor = [], None
+    while True:
+        logs, cursor = log.scan(limit, {}, None, None, cursor, tokens)
+        results.extend(entry["message"]["order_id"] for entry in logs)
+        if cursor is None:
+            return results
+
+
+@pytest.mark.parametrize("segment_format, compress", [("jsonl", False), ("jsonl", True), ("columnar", True)])
+def test_indexed_scan_matches_full_scan(tmp_path, monkeypatch, segment_format, compress):
+    log = SegmentedLogFile(str(tmp_path), "system_interactions.log", max_bytes=1 << 30, max_age=0,
+                           compress=compress, segment_format=segment_format, index=True)
+    log.open()
+    try:
+        now = time.time()
+        for segment in range(3):
+            # Innerhalb eines Segments nicht zeitlich geordnet, damit die Konvertierung umsortiert
+            for i in (2, 0, 1):
+                ts = now - 300 + segment * 60 + i
+                log.append([_line(ts, f"ORD-{segment}{i}"), _line(ts, "ORD-common")], ts, ts)
+            if segment < 2:
+                log.rotate()
+        log.compress_pending()
+        index_files = [name for name in os.listdir(log.segment_dir) if name.endswith(".idx")]
+        assert len(index_files) == 2
+
+        # Mit Index wird beim Suchen nicht tokenisiert
+        def fail(line):
+            raise AssertionError("Segment wurde ohne Index gescannt")
+        monkeypatch.setattr("app.segments.tokenize_line", fail)
+        assert _search(log, ["ord-21"]) == ["ORD-21"]
+        assert _search(log, ["ord-10"]) == ["ORD-10"]
+        common = _search(log, ["ord-common"], limit=2)
+        assert len(common) == 9
+        assert _search(log, ["ord", "missing"]) == []
+        monkeypatch.undo()
+
+        # Ohne Index (z.B. ältere Segmente) liefert der Scan dasselbe
+        log.index = False
+        assert _search(log, ["ord-common"], limit=2) == common
+        assert _search(log, ["ord-21"]) == ["ORD-21"]
+    finally:
+        log.close()
+
+
+def test_active_segment_index_is_rebuilt_after_restart(tmp_path):
+    log = SegmentedLogFile(str(tmp_path), "system_interactions.log", max_bytes=1 << 30, max_age=0, index=True)
+    log.open()
+    now = time.time()
+    log.append([_line(now - 2, "ORD-1"), _line(now - 1, "ORD-2")], now - 2, now - 1)
+    assert _search(log, ["ord-2"]) == ["ORD-2"]
+    log.close()
+
+    log = SegmentedLogFile(str(tmp_path), "system_interactions.log", max_bytes=1 << 30, max_age=0, index=True)
+    log.open()
+    try:
+        assert _search(log, ["ord-1"]) == ["ORD-1"]
+        log.rotate()
+        assert _search(log, ["ord-2"]) == ["ORD-2"]
+        log.enforce_retention(0, 1)
+        assert not [name for name in os.listdir(log.segment_dir) if name.endswith(".idx")]
+    finally:
+        log.close()
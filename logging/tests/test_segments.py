@@ -0,0 +1,47 @@
+import json
+import time
+from datetime import datetime
+
+from app.segments import SegmentedLogFile
+
+
+def _append(log, ts, name):
+    line = json.dumps({"timestamp": datetime.fromtimestamp(ts).isoformat(), "source_system": name,
+                       "target_system": "erp", "interaction_type": "order", "message": {}, "status": "success"})
+    log.append([line], ts, ts)
+
+
+def test_scan_skips_backfilled_segment_between_recent_ones(tmp_path):
+    log = SegmentedLogFile(str(tmp_path), "system_interactions.log", max_bytes=1 << 30, max_age=0)
+    log.open()
+    try:
+        now = time.time()
+        _append(log, now - 30, "recent-old-seq")
+        log.rotate()
+        _append(log, now - 3 * 86400, "backfilled")
+        log.rotate()
+        _append(log, now - 10, "recent-new-seq")
+        log.rotate()
+
+        logs, cursor = log.scan(100, {}, now - 60, None, None)
+
+        assert [entry["source_system"] for entry in logs] == ["recent-new-seq", "recent-old-seq"]
+        assert cursor is None
+    finally:
+        log.close()
+
+
+def test_retention_removes_expired_segment_behind_recent_one(tmp_path):
+    log = SegmentedLogFile(str(tmp_path), "system_interactions.log", max_bytes=1 << 30, max_age=0)
+    log.open()
+    try:
+        now = time.time()
+        _append(log, now - 30, "recent")
+        log.rotate()
+        _append(log, now - 3 * 86400, "backfilled")
+        log.rotate()
+
+        assert log.enforce_retention(86400, 0) == 1
+        assert [segment.last_ts for segment in log.segments()] == [int((now - 30) * 1000) / 1000.0]
+    finally:
+        log.close()